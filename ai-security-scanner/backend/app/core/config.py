@@ -8,6 +8,16 @@ from pathlib import Path
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
+# __file__ is .../backend/app/core/config.py → parents[2] is .../backend/
+# Resolved once at import instead of on every Settings() construction.
+_BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Per-user cache location (XDG), so the LLM response cache never lands in
+# whatever directory the server or test run was started from
+_DEFAULT_LLM_CACHE_DIR = str(
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ai-security-scanner" / "llm"
+)
+
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
@@ -32,7 +42,27 @@ class Settings(BaseSettings):
     ALLOWED_ORIGINS: list[str] = ["*"]
 
     # File limits
-    MAX_FILE_SIZE_MB: int = 10
+    MAX_FILE_SIZE_MB: int = 10          # per uploaded file
+    MAX_REQUEST_SIZE_MB: int = 50       # whole request body (multi-file uploads)
+
+    # Concurrency — files scanned in parallel per worker
+    MAX_PARALLEL_SCANS: int = 3
+    # Files this large run rule detectors in a process pool created at app
+    # startup; None (default) keeps every scan in threads. Worth enabling only
+    # on multi-core hosts: each worker re-imports the app on first use.
+    RULE_SCAN_PROCESS_MIN_KB: int | None = None
+
+    # LLM scans — one multi-category Gemini call per file; per-category calls
+    # are used as the fallback (or always, when this is False)
+    LLM_COMBINED_SCAN: bool = True
+    LLM_SCAN_CONCURRENCY: int = 5       # Gemini calls in flight per worker
+    LLM_SCAN_TIMEOUT: float = 30.0      # seconds per call, retries included
+    LLM_SCAN_PRECHECK: bool = True      # skip section-specific scans with no signal
+
+    # LLM response cache — identical prompts reuse the stored Gemini reply
+    LLM_CACHE_DIR: str = _DEFAULT_LLM_CACHE_DIR
+    LLM_SCAN_CACHE_TTL: int = 86400     # seconds; 0 disables the cache
+    LLM_CACHE_SHARDS: int = 8           # SQLite files, so workers don't contend on one write lock
 
     # Reports
     REPORT_DIR: str = "static/reports"
@@ -49,16 +79,11 @@ class Settings(BaseSettings):
         if self.GOOGLE_APPLICATION_CREDENTIALS:
             # Resolve relative path against the directory containing this file
             # (backend/) so that 'gcp-credentials.json' always works.
+            # _BACKEND_DIR is already resolved, so no further resolve() is needed.
             creds_path = Path(self.GOOGLE_APPLICATION_CREDENTIALS)
             if not creds_path.is_absolute():
-                # __file__ is .../backend/app/core/config.py
-                # .parent      = .../backend/app/core/
-                # .parent.parent = .../backend/app/
-                # .parent.parent.parent = .../backend/   <-- this is what we want
-                backend_dir = Path(__file__).resolve().parent.parent.parent
-                creds_path = backend_dir / creds_path
-            abs_path = str(creds_path.resolve())
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = abs_path
+                creds_path = _BACKEND_DIR / creds_path
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(creds_path)
 
         # Also ensure project/location are available as env vars for SDKs
         # that fall back to GOOGLE_CLOUD_PROJECT
@@ -72,5 +97,12 @@ def get_settings() -> Settings:
     return Settings()
 
 
-# Convenience export
-settings = get_settings()
+def __getattr__(name: str):
+    """
+    Convenience export, resolved lazily: `from app.core.config import settings`
+    still works, but importing this module alone (e.g. for Settings or
+    get_settings in tests) doesn't trigger environment validation.
+    """
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
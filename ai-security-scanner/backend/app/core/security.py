@@ -1,12 +1,21 @@
 """
-Security utilities: file validation, content sanitization.
+Security utilities: file validation, content sanitization, request size limits.
 """
 
 import re
 from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-ALLOWED_EXTENSIONS = {"txt", "json", "yaml", "yml", "py"}
-MAX_FILE_SIZE_BYTES = 10 * 1024 * 1024  # 10 MB
+from app.core.config import settings
+
+ALLOWED_EXTENSIONS = frozenset({"txt", "json", "yaml", "yml", "py"})
+_ALLOWED_SORTED = sorted(ALLOWED_EXTENSIONS)  # for error messages
+
+# Null bytes, or runs of 4+ newlines (nulls inside a run don't break it)
+_SANITIZE_RE = re.compile(r"(?:\n\x00*){4,}|\x00")
+# Bytes path: nulls are removed with translate() first, so only newline runs remain
+_BLANK_LINES_BYTES_RE = re.compile(rb"\n{4,}")
 
 
 def validate_upload(file: UploadFile) -> str:
@@ -17,11 +26,11 @@ def validate_upload(file: UploadFile) -> str:
     if not file.filename:
         raise HTTPException(status_code=400, detail="No filename provided.")
 
-    ext = file.filename.rsplit(".", 1)[-1].lower()
+    ext = file.filename.rpartition(".")[2].lower()
     if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file type '.{ext}'. Allowed: {sorted(ALLOWED_EXTENSIONS)}",
+            detail=f"Unsupported file type '.{ext}'. Allowed: {_ALLOWED_SORTED}",
         )
 
     # Normalize yaml/yml → yaml
@@ -33,16 +42,62 @@ def sanitize_content(content: str) -> str:
     Basic content sanitization — strip null bytes and excessive whitespace.
     Does NOT strip legitimate code characters.
     """
-    content = content.replace("\x00", "")
-    # Collapse runs of 4+ blank lines into 2
-    content = re.sub(r"\n{4,}", "\n\n", content)
-    return content
+    # Single pass: drop null bytes and collapse runs of 4+ blank lines into 2
+    return _SANITIZE_RE.sub(_sanitize_repl, content)
+
+
+def _sanitize_repl(match: re.Match) -> str:
+    return "\n\n" if match.group()[0] == "\n" else ""
+
+
+def sanitize_bytes(content: bytes) -> bytes:
+    """
+    Bytes variant of sanitize_content, applied to uploads before decoding.
+    NUL and newline bytes never occur inside multi-byte UTF-8 sequences,
+    so cleaning the raw buffer gives the same text once decoded.
+    """
+    return _BLANK_LINES_BYTES_RE.sub(b"\n\n", content.translate(None, b"\x00"))
 
 
-def check_file_size(content: bytes) -> None:
-    """Raise HTTPException if content exceeds the size limit."""
-    if len(content) > MAX_FILE_SIZE_BYTES:
+def check_file_size(size: int) -> None:
+    """
+    Raise HTTPException if an upload of `size` bytes exceeds the limit.
+    Called with a running byte count while the upload is being read, so
+    oversized files are rejected before they are fully buffered.
+    """
+    max_mb = settings.MAX_FILE_SIZE_MB
+    if size > max_mb * 1024 * 1024:
         raise HTTPException(
             status_code=413,
-            detail=f"File too large. Maximum size is {MAX_FILE_SIZE_BYTES // (1024*1024)} MB.",
+            detail=f"File too large. Maximum size is {max_mb} MB.",
         )
+
+
+class SizeLimitMiddleware:
+    """
+    ASGI middleware that rejects requests whose declared Content-Length is
+    over the limit with 413, before any of the body is received or spooled.
+    Bodies without a Content-Length are still capped per file by the
+    chunked upload reader (see check_file_size).
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int) -> None:
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_body_size:
+                        response = JSONResponse(
+                            status_code=413,
+                            content={
+                                "detail": f"Request too large. Maximum size is "
+                                          f"{self.max_body_size // (1024*1024)} MB."
+                            },
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
@@ -4,36 +4,60 @@ AI Security Scanner — OWASP-Based Vulnerability Assessment System v1.0
 """
 
 import asyncio
+import os
 import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
+from functools import lru_cache
 
-from fastapi import FastAPI, File, HTTPException, UploadFile, Body
+import aiofiles
+import anyio
+import orjson
+from fastapi import BackgroundTasks, FastAPI, File, HTTPException, UploadFile, Body
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
 from app.core.config import settings
 from app.core.logging import logger
+from app.core.security import SizeLimitMiddleware
 from app.models.scan_response import ScanResponse
-from app.services import scan_manager
-from app.services.reporter import generate_pdf_report
-from fastapi.responses import FileResponse, StreamingResponse
+from app.services import detector_rule, scan_manager
+from app.services.reporter import render_pdf_report
+from app.services.scorer import get_risk_level
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from pathlib import Path
-import json
 
 
 # ---------------------------------------------------------------------------
 # App initialisation
 # ---------------------------------------------------------------------------
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The rule-scan process pool (if RULE_SCAN_PROCESS_MIN_KB enables it)
+    # lives exactly as long as the app, so its workers never outlive it
+    detector_rule.start_process_pool()
+    try:
+        yield
+    finally:
+        detector_rule.shutdown_process_pool()
+
+
 app = FastAPI(
     title=settings.APP_TITLE,
     version=settings.APP_VERSION,
     description="OWASP-Based AI Vulnerability Assessment System with LLM-Powered Detection",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+# Reject oversized bodies from Content-Length before they are buffered.
+# Added before CORSMiddleware so CORS stays outermost and the 413 carries
+# CORS headers (the browser would otherwise report an opaque network error).
+app.add_middleware(SizeLimitMiddleware, max_body_size=settings.MAX_REQUEST_SIZE_MB * 1024 * 1024)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,
@@ -43,6 +67,39 @@ app.add_middleware(
 )
 
 
+# ---------------------------------------------------------------------------
+# Background report rendering
+# ---------------------------------------------------------------------------
+
+# Report directory — parsed and created once at import
+REPORT_DIR_PATH = Path(settings.REPORT_DIR)
+REPORT_DIR_PATH.mkdir(parents=True, exist_ok=True)
+# Pre-stringified so per-scan paths are a plain f-string, not Path objects
+_REPORT_DIR_STR = os.fspath(REPORT_DIR_PATH)
+
+# Reports queued for rendering that are not on disk yet
+_PENDING_REPORTS: set[str] = set()
+
+
+async def _write_report(report_data: dict, report_path: str) -> None:
+    """
+    Render a PDF report in a worker thread and write it with aiofiles.
+    Runs as a background task so scan responses don't wait on ReportLab.
+    The file is written under a temporary name and renamed into place, so
+    /api/reports never serves a partial PDF.
+    """
+    try:
+        pdf_bytes = await asyncio.to_thread(render_pdf_report, report_data)
+        tmp_path = f"{report_path}.part"
+        async with aiofiles.open(tmp_path, "wb") as f:
+            await f.write(pdf_bytes)
+        os.replace(tmp_path, report_path)
+    except Exception as e:
+        logger.error(f"PDF generation failed: {e}")
+    finally:
+        _PENDING_REPORTS.discard(os.path.basename(report_path))
+
+
 # ---------------------------------------------------------------------------
 # Routes
 # ---------------------------------------------------------------------------
@@ -58,133 +115,115 @@ async def health_check():
         "status": "healthy",
         "service": settings.APP_TITLE,
         "version": settings.APP_VERSION,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": _health_timestamp(int(time.time())),
     }
 
 
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@lru_cache(maxsize=1)
+def _health_timestamp(second: int) -> str:
+    """Keyed by the current epoch second, so probes reuse one string per second."""
+    return _now_iso()
+
+
 @app.get("/api/reports/{filename}")
 async def download_report(filename: str):
-    """Serve PDF report."""
-    file_path = Path(settings.REPORT_DIR) / filename
-    if not file_path.exists():
+    """Serve PDF report. Returns 202 while the report is still rendering."""
+    file_path = f"{_REPORT_DIR_STR}/{filename}"
+    # Single stat: reused by FileResponse instead of exists() + its own stat
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        if filename in _PENDING_REPORTS:
+            return JSONResponse(
+                status_code=202,
+                content={"status": "pending"},
+                headers={"Retry-After": "1"},
+            )
         raise HTTPException(status_code=404, detail="Report not found")
-    return FileResponse(file_path, media_type="application/pdf", filename=filename)
+    return FileResponse(file_path, media_type="application/pdf", filename=filename, stat_result=stat_result)
 
-@app.post("/api/scan", response_model=ScanResponse | dict, tags=["Scan"])
-async def scan_file(files: list[UploadFile] = File(...)):
+def _build_overall_and_report(
+    scan_results: list[ScanResponse],
+    files_count: int,
+    start_time: float,
+    background_tasks: BackgroundTasks,
+    processed_at: str | None = None,
+) -> dict:
     """
-    Hybrid vulnerability scan endpoint — all 10 OWASP LLM 2025 categories.
-    Supports single or multiple file uploads.
+    Aggregate per-file results into the overall block, queue the PDF report
+    and return the response body shared by /api/scan and /api/scan-text.
+    Results are dumped once here; the endpoints return the body through
+    ORJSONResponse without a second validation pass.
     """
-    # If single file passed (backward compat or single upload), wrap in list?
-    # FastAPI handles List[UploadFile] automatically.
-    
-    overall_start_time = time.perf_counter()
-    
-    # Delegate to scan_manager
-    scan_results = await scan_manager.scan_files_concurrently(files)
-
-    # If only 1 file, return just that ScaResponse (backward compatibility for UI? 
-    # No, requirement says "Return ... files: [...], overall: {...}". 
-    # But checking constraints: "Keep single-file behavior working."
-    # If the UI expects ScanResponse for single file, I might need to check.
-    # However, the requirement says "Return a response schema like: files: ..., overall: ...".
-    # I will stick to the new MultiFilesResponse schema for everything to be consistent, implies UI update.
-    
     # Calculate aggregated key metrics
-    max_risk = 0
-    total_findings = 0
-    for r in scan_results:
-        max_risk = max(max_risk, r.risk_score)
-        total_findings += r.total_findings
-    
-    # Map max_risk to string level
-    overall_level = "Low"
-    if max_risk >= 76: overall_level = "Critical"
-    elif max_risk >= 51: overall_level = "High"
-    elif max_risk >= 26: overall_level = "Medium"
+    max_risk = max((r.risk_score for r in scan_results), default=0)
+    total_findings = sum(r.total_findings for r in scan_results)
 
     overall_data = {
         "risk_score": max_risk,
-        "risk_level": overall_level,
-        "total_files": len(files),
+        "risk_level": get_risk_level(max_risk),
+        "total_files": files_count,
         "total_findings": total_findings,
-        "processed_at": datetime.now(timezone.utc).isoformat(),
-        "total_duration": round(time.perf_counter() - overall_start_time, 3)
+        "processed_at": processed_at or _now_iso(),
+        "total_duration": round(time.perf_counter() - start_time, 3)
     }
 
-    # Generate PDF Report
-    try:
-        batch_id = f"scan-{uuid.uuid4()}"
-        pdf_filename = f"{batch_id}.pdf"
-        report_path = Path(settings.REPORT_DIR) / pdf_filename
-        
-        report_data = {
-            "files": scan_results,
-            "overall": overall_data
-        }
-        
-        generate_pdf_report(report_data, str(report_path))
-        pdf_url = f"/api/reports/{pdf_filename}"
-    except Exception as e:
-        logger.error(f"PDF generation failed: {e}")
-        pdf_url = None
+    # Queue PDF Report — rendered after the response is sent
+    batch_id = f"scan-{uuid.uuid4()}"
+    pdf_filename = f"{batch_id}.pdf"
+    report_path = f"{_REPORT_DIR_STR}/{pdf_filename}"
 
-    return {
+    report_data = {
         "files": scan_results,
+        "overall": overall_data
+    }
+
+    _PENDING_REPORTS.add(pdf_filename)
+    background_tasks.add_task(_write_report, report_data, report_path)
+    pdf_url = f"/api/reports/{pdf_filename}"
+
+    return {
+        "files": [r.model_dump() for r in scan_results],
         "overall": overall_data,
-        "pdf_url": pdf_url
+        "pdf_url": pdf_url,
+        "pdf_status": "pending"
     }
 
 
-@app.post("/api/scan-text", response_model=ScanResponse | dict, tags=["Scan"])
-async def scan_text(input: TextInput):
+@app.post("/api/scan", response_model=None, response_class=ORJSONResponse, tags=["Scan"])
+async def scan_file(background_tasks: BackgroundTasks, files: list[UploadFile] = File(...)):
     """
-    Scan raw text content directly.
+    Hybrid vulnerability scan endpoint — all 10 OWASP LLM 2025 categories.
+    Supports single or multiple file uploads.
     """
-    scan_results = [await scan_manager.scan_text_content(input.content, input.filename)]
-
-    # Calculate aggregated key metrics (duplicated from scan_file for now)
-    max_risk = 0
-    total_findings = 0
-    for r in scan_results:
-        max_risk = max(max_risk, r.risk_score)
-        total_findings += r.total_findings
-    
-    overall_level = "Low"
-    if max_risk >= 76: overall_level = "Critical"
-    elif max_risk >= 51: overall_level = "High"
-    elif max_risk >= 26: overall_level = "Medium"
+    # FastAPI handles List[UploadFile] automatically; a single upload is a list of 1.
+    overall_start_time = time.perf_counter()
 
-    overall_data = {
-        "risk_score": max_risk,
-        "risk_level": overall_level,
-        "total_files": 1,
-        "processed_at": datetime.now(timezone.utc).isoformat(),
-    }
+    # Delegate to scan_manager
+    scan_results = await scan_manager.scan_files_concurrently(files)
 
-    # Generate PDF Report
-    try:
-        batch_id = f"scan-{uuid.uuid4()}"
-        pdf_filename = f"{batch_id}.pdf"
-        report_path = Path(settings.REPORT_DIR) / pdf_filename
-        
-        report_data = {
-            "files": scan_results,
-            "overall": overall_data
-        }
-        
-        generate_pdf_report(report_data, str(report_path))
-        pdf_url = f"/api/reports/{pdf_filename}"
-    except Exception as e:
-        logger.error(f"PDF generation failed: {e}")
-        pdf_url = None
+    # Always return the MultiFilesResponse shape (files + overall), even for one file.
+    return ORJSONResponse(
+        _build_overall_and_report(scan_results, len(files), overall_start_time, background_tasks)
+    )
 
-    return {
-        "files": scan_results,
-        "overall": overall_data,
-        "pdf_url": pdf_url
-    }
+
+@app.post("/api/scan-text", response_model=None, response_class=ORJSONResponse, tags=["Scan"])
+async def scan_text(input: TextInput, background_tasks: BackgroundTasks):
+    """
+    Scan raw text content directly.
+    """
+    overall_start_time = time.perf_counter()
+    now_iso = _now_iso()
+    scan_results = [await scan_manager.scan_text_content(input.content, input.filename, timestamp=now_iso)]
+
+    return ORJSONResponse(
+        _build_overall_and_report(scan_results, 1, overall_start_time, background_tasks, processed_at=now_iso)
+    )
 
 
 @app.post("/api/scan/progress", tags=["Scan"])
@@ -192,28 +231,38 @@ async def scan_with_progress(files: list[UploadFile] = File(...)):
     """
     Streaming content endpoint. Returns NDJSON events for progress updates.
     """
-    queue = asyncio.Queue()
+    # Read uploads now: FastAPI closes them once this handler returns,
+    # before the streaming body below starts running.
+    uploads = [await scan_manager.load_upload(f) for f in files]
 
-    async def producer():
-        try:
-            # This returns the final results, but we only care about the side-effect (events in queue)
-            # scan_manager.scan_files_concurrently calls process_single_file which puts events
-            await scan_manager.scan_files_concurrently(files, queue)
-        except Exception as e:
-            logger.error(f"Streaming scan failed: {e}")
-            await queue.put({"type": "error", "message": str(e)})
-        finally:
-            await queue.put(None) # Signal done
+    async def producer(send):
+        # Closing the send stream ends the consumer's iteration — no sentinel.
+        async with send:
+            try:
+                # One task per file; scan_loaded bounds concurrency with the
+                # MAX_PARALLEL_SCANS semaphore and emits file_complete as each file finishes.
+                async with asyncio.TaskGroup() as tg:
+                    for upload in uploads:
+                        tg.create_task(scan_manager.scan_loaded(*upload, progress=send))
+            except Exception as e:
+                logger.error(f"Streaming scan failed: {e}")
+                await send.send({"type": "error", "message": str(e)})
 
     async def consumer():
-        # Start producer task
-        asyncio.create_task(producer())
-        
-        while True:
-            item = await queue.get()
-            if item is None:
-                break
-            # Yield NDJSON line
-            yield json.dumps(item) + "\n"
+        # Bounded so a slow client applies backpressure instead of growing memory.
+        # The producer runs as its own task rather than in a task group here:
+        # a generator must not yield inside a cancel scope, since a client
+        # disconnect would close it from another task mid-scope.
+        send, recv = anyio.create_memory_object_stream(max_buffer_size=256)
+        task = asyncio.create_task(producer(send))
+        try:
+            async with recv:
+                async for item in recv:
+                    # Yield NDJSON line
+                    yield orjson.dumps(item) + b"\n"
+        finally:
+            # No-op once the scan is done; stops it if the client went away
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
 
     return StreamingResponse(consumer(), media_type="application/x-ndjson")
@@ -67,3 +67,4 @@ class MultiFilesResponse(BaseModel):
     overall: dict = Field(..., description="Aggregated risk metrics")
     processed_at: str = Field(..., description="ISO 8601 timestamp")
     pdf_url: str | None = Field(None, description="URL to download consolidated PDF report")
+    pdf_status: str | None = Field(None, description="'pending' while the PDF report is rendered in the background")
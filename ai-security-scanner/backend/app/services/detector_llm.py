@@ -7,24 +7,37 @@ to perform deep contextual analysis beyond what rules can catch.
 Design notes:
 - Each scan function receives parsed_data but passes only its RELEVANT
   sub-section to Gemini. This is critical for correct category routing.
-- Knowledge base files are loaded lazily (not at import time).
-- Each scan function is independently async (run in parallel via gather()).
+- Knowledge base files are read and markdown-compacted once at import
+  into a plain dict.
+- By default all 10 categories go to Gemini as ONE composite prompt with a
+  structured array response; shared sections (system prompt, raw content)
+  are sent once and referenced by label from each category block.
+- If that call fails or returns a mismatched array, the system-prompt
+  categories (LLM01/02/07/09) share one call and the rest are sent as
+  per-category prompts through the client's batch entry point.
 - The client is reused across calls (singleton via get_vertex_client()).
+- Found results are validated into VulnerabilityFinding here, so a
+  malformed Gemini finding is logged and dropped at the boundary.
 """
 
 import asyncio
-import json
+import logging
 import os
-from functools import lru_cache
+import re
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
+import orjson
+from pydantic import ValidationError
+
+from app.core.config import settings
 from app.core.logging import logger
+from app.models.scan_response import VulnerabilityFinding
 from app.services.vertex_ai import get_vertex_client
-from app.services.parser import get_line_number
+from app.services.parser import build_line_index, line_for_offset
 
 # ---------------------------------------------------------------------------
-# Knowledge base loading (lazy, cached)
+# Knowledge base loading (eager, once per process)
 # ---------------------------------------------------------------------------
 
 KB_PATH = Path(__file__).parent.parent / "knowledge_base"
@@ -43,21 +56,54 @@ _KB_FILES = {
 }
 
 
-@lru_cache(maxsize=10)
-def _load_kb(category: str) -> str:
-    """Load and cache a knowledge base file. Returns empty string on error."""
-    filename = _KB_FILES.get(category, "")
-    if not filename:
-        return ""
-    path = KB_PATH / filename
+_MD_RULE_RE = re.compile(r"^(?:-{3,}|\*{3,}|_{3,}|`{3}.*)$")
+_MD_HEADING_RE = re.compile(r"^#{1,6}\s+")
+
+
+def _compact_kb(text: str) -> str:
+    """
+    Strip markdown scaffolding Gemini doesn't need: blank lines, horizontal
+    rules, code-fence markers, heading hashes and bold markers. Text, bullets
+    and fenced examples themselves are kept.
+    """
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or _MD_RULE_RE.match(line):
+            continue
+        lines.append(_MD_HEADING_RE.sub("", line).replace("**", ""))
+    return "\n".join(lines)
+
+
+def _preload_kb() -> dict[str, str]:
+    """
+    Read every knowledge base file once at import (they're small and all
+    needed) and compact their markdown. Missing or unreadable files are
+    logged here, once, instead of on every scan.
+    """
+    categories_by_file = {filename: category for category, filename in _KB_FILES.items()}
+    content: dict[str, str] = {}
     try:
-        return path.read_text(encoding="utf-8")
-    except FileNotFoundError:
-        logger.error("Knowledge base file not found: %s", path)
-        return f"[Knowledge base for {category} not available]"
-    except Exception as exc:
-        logger.error("Error loading KB %s: %s", path, exc)
-        return ""
+        for path in KB_PATH.iterdir():
+            category = categories_by_file.get(path.name)
+            if category is None:
+                continue
+            try:
+                content[category] = _compact_kb(path.read_bytes().decode("utf-8"))
+            except Exception as exc:
+                logger.error("Error loading KB %s: %s", path, exc)
+                content[category] = ""
+    except OSError as exc:
+        logger.error("Knowledge base directory unreadable: %s: %s", KB_PATH, exc)
+
+    for category, filename in _KB_FILES.items():
+        if category not in content:
+            logger.error("Knowledge base file not found: %s", KB_PATH / filename)
+            content[category] = f"[Knowledge base for {category} not available]"
+    return content
+
+
+_KB_CONTENT: dict[str, str] = _preload_kb()
 
 
 # ---------------------------------------------------------------------------
@@ -76,44 +122,193 @@ _JSON_SCHEMA = """{
 }"""
 
 
-def _build_prompt(
-    category: str,
-    category_name: str,
-    task_description: str,
-    focused_content: Any,  # The specific section for this category
-) -> str:
-    """Build an LLM prompt using ONLY the relevant content section."""
-    kb_content = _load_kb(category)
-    # Serialize the focused content
-    if isinstance(focused_content, str):
-        content_str = focused_content
-    else:
-        content_str = json.dumps(focused_content, indent=2, default=str)
+# ---------------------------------------------------------------------------
+# Token budgets — trim at structural boundaries, never mid-value
+# ---------------------------------------------------------------------------
 
-    if len(content_str) > 8000:
-        content_str = content_str[:8000] + "\n... [truncated for context window]"
+# Approximate per-section input budgets, in tokens
+_BUDGETS = {"kb": 3200, "content": 3600, "shared_system_prompt": 3600}
+# Gemini averages roughly 4 characters per token on English text and code
+_CHARS_PER_TOKEN = 4
+_TRUNCATION_MARK = " ... [truncated]"
+# Fallback keys that only echo raw_content — first to go when over budget
+_PRUNABLE_KEYS = ("raw_content", "raw_content_preview")
 
-    return f"""You are a senior cybersecurity expert specializing in OWASP Top 10 for LLM Applications.
-Your task is to analyze the following AI agent configuration section for {category} ({category_name}) vulnerabilities ONLY.
 
-## OWASP KNOWLEDGE BASE FOR {category}
-{kb_content}
+def _approx_tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN
 
-## CONFIGURATION SECTION TO ANALYZE (focused on {category_name})
-{content_str}
 
-## ANALYSIS TASK
-{task_description}
+_ORJSON_OPTS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
 
-IMPORTANT: Only report findings for {category} ({category_name}).
-Do NOT report findings for other OWASP categories — those are handled by separate scanners.
-Be precise: only flag real vulnerabilities with concrete evidence from the configuration above.
-Assign confidence based on certainty of evidence.
 
-## REQUIRED OUTPUT FORMAT
-Respond ONLY with valid JSON matching this exact schema:
-{_JSON_SCHEMA}
-"""
+def _serialize(value: Any) -> str:
+    # orjson emits non-ASCII as UTF-8 rather than \uXXXX escapes — fewer tokens too
+    return value if isinstance(value, str) else orjson.dumps(value, default=str, option=_ORJSON_OPTS).decode("utf-8")
+
+
+def _shrink(value: Any, max_chars: int) -> Any:
+    """Cap every string inside `value` at max_chars, keeping the structure intact."""
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + _TRUNCATION_MARK
+    if isinstance(value, dict):
+        return {k: _shrink(v, max_chars) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_shrink(v, max_chars) for v in value]
+    return value
+
+
+def _cut_at_boundary(text: str, max_chars: int) -> str:
+    """Cut text at the last paragraph (or line) break before max_chars."""
+    if len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    cut = head.rfind("\n\n")
+    if cut < max_chars // 2:
+        cut = head.rfind("\n")
+    if cut < max_chars // 2:
+        cut = max_chars
+    return head[:cut] + "\n" + _TRUNCATION_MARK.strip()
+
+
+def _fit_content(focused_content: Any, budget: int = _BUDGETS["content"]) -> str:
+    """
+    Serialize focused content within a token budget.
+    Over budget, raw_content fallbacks are dropped first (when structured
+    keys remain), then long strings are shortened until the JSON fits, so
+    evidence keeps its surrounding keys instead of being cut mid-string.
+    """
+    content_str = _serialize(focused_content)
+    if _approx_tokens(content_str) <= budget:
+        return content_str
+
+    max_chars = budget * _CHARS_PER_TOKEN
+    if isinstance(focused_content, str):
+        return _cut_at_boundary(focused_content, max_chars)
+
+    if isinstance(focused_content, dict):
+        pruned = {k: v for k, v in focused_content.items() if k not in _PRUNABLE_KEYS}
+        if pruned and len(pruned) < len(focused_content):
+            focused_content = pruned
+            content_str = _serialize(pruned)
+            if _approx_tokens(content_str) <= budget:
+                return content_str
+
+    limit = max_chars
+    while limit > 64:
+        limit //= 2
+        content_str = _serialize(_shrink(focused_content, limit))
+        if _approx_tokens(content_str) <= budget:
+            return content_str
+    return _cut_at_boundary(content_str, max_chars)
+
+
+def _fit_kb(category: str, budget: int = _BUDGETS["kb"]) -> str:
+    """Knowledge base text for a category, cut at a paragraph break if over budget."""
+    return _cut_at_boundary(_KB_CONTENT.get(category, ""), budget * _CHARS_PER_TOKEN)
+
+
+# Invariant text (persona, instructions, schema) joined once at import;
+# _build_prompt only interpolates the per-scan slots.
+_PROMPT_TEMPLATE = (
+    "You are a senior cybersecurity expert specializing in OWASP Top 10 for LLM Applications.\n"
+    "Your task is to analyze the following AI agent configuration section for "
+    "%(category)s (%(category_name)s) vulnerabilities ONLY.\n"
+    "\n"
+    "## OWASP KNOWLEDGE BASE FOR %(category)s\n"
+    "%(kb)s\n"
+    "\n"
+    "## CONFIGURATION SECTION TO ANALYZE (focused on %(category_name)s)\n"
+    "%(content)s\n"
+    "\n"
+    "## ANALYSIS TASK\n"
+    "%(task)s\n"
+    "\n"
+    "IMPORTANT: Only report findings for %(category)s (%(category_name)s).\n"
+    "Do NOT report findings for other OWASP categories — those are handled by separate scanners.\n"
+    "Be precise: only flag real vulnerabilities with concrete evidence from the configuration above.\n"
+    "Assign confidence based on certainty of evidence.\n"
+    "\n"
+    "## REQUIRED OUTPUT FORMAT\n"
+    "Respond ONLY with valid JSON matching this exact schema:\n"
+    + _JSON_SCHEMA.replace("%", "%%") + "\n"
+)
+
+
+def _build_prompt(
+    category: str,
+    category_name: str,
+    task_description: str,
+    focused_content: Any,  # The specific section for this category
+) -> str:
+    """Build an LLM prompt using ONLY the relevant content section."""
+    return _PROMPT_TEMPLATE % {
+        "category": category,
+        "category_name": category_name,
+        "kb": _fit_kb(category),
+        "content": _fit_content(focused_content),
+        "task": task_description,
+    }
+
+
+def _raw_preview(parsed_data: dict[str, Any], max_chars: int = 3000) -> str:
+    """Leading slice of raw_content sent when a category has no structured section."""
+    return (parsed_data.get("raw_content", "") or "")[:max_chars]
+
+
+# category -> extractor returning only the section of parsed_data relevant
+# to that category. Section-specific scans fall back to a raw_content preview
+# so Gemini still has something to reason about.
+_FOCUS_EXTRACTORS: dict[str, Callable[[dict[str, Any]], Any]] = {
+    # Prompt injection: system_prompt + any user-controlled inputs
+    "LLM01:2025": lambda p: {
+        "system_prompt": p.get("system_prompt", ""),
+        "tools": p.get("tools", []),
+    },
+    # Sensitive info: everything (credentials can appear anywhere)
+    "LLM02:2025": lambda p: {
+        "system_prompt": p.get("system_prompt", ""),
+        "model_supply_chain": p.get("model_supply_chain", {}),
+        "raw_content_preview": _raw_preview(p),
+    },
+    # Supply chain: model, plugins, adapters, sbom
+    "LLM03:2025": lambda p: (
+        p.get("model_supply_chain") or {"raw_content": _raw_preview(p)}
+    ),
+    # Data poisoning: pipeline, data_sources, training controls
+    "LLM04:2025": lambda p: (
+        p.get("training_ingestion") or {"raw_content": _raw_preview(p)}
+    ),
+    # Output handling: output handlers + raw code
+    "LLM05:2025": lambda p: {
+        "output_handlers": p.get("output_handlers", []),
+        "raw_content": _raw_preview(p),
+    },
+    # Excessive agency: tools + permissions
+    "LLM06:2025": lambda p: {
+        "tools": p.get("tools", []),
+        "permissions": p.get("permissions", []),
+    },
+    # System prompt leakage: system prompt (where secrets live)
+    "LLM07:2025": lambda p: {
+        "system_prompt": p.get("system_prompt", ""),
+        "raw_content": _raw_preview(p),
+    },
+    # Vector/embedding: rag config
+    "LLM08:2025": lambda p: (
+        p.get("rag_vector") or {"raw_content": _raw_preview(p)}
+    ),
+    # Misinformation: policy misinfo signals + system prompt
+    "LLM09:2025": lambda p: {
+        "system_prompt": p.get("system_prompt", ""),
+        "policy_misinfo": p.get("policy_misinfo", {}),
+        "raw_content": _raw_preview(p, 2000),
+    },
+    # Unbounded consumption: resource limits
+    "LLM10:2025": lambda p: (
+        p.get("resource_limits") or {"raw_content": _raw_preview(p)}
+    ),
+}
 
 
 def _get_focused_content(category: str, parsed_data: dict[str, Any]) -> Any:
@@ -121,404 +316,479 @@ def _get_focused_content(category: str, parsed_data: dict[str, Any]) -> Any:
     Return only the section of parsed_data relevant to this category.
     This prevents Gemini from getting confused by unrelated config sections.
     """
-    if category == "LLM01:2025":
-        # Prompt injection: system_prompt + any user-controlled inputs
-        return {
-            "system_prompt": parsed_data.get("system_prompt", ""),
-            "tools": parsed_data.get("tools", []),
-        }
-    elif category == "LLM02:2025":
-        # Sensitive info: everything (credentials can appear anywhere)
-        return {
-            "system_prompt": parsed_data.get("system_prompt", ""),
-            "model_supply_chain": parsed_data.get("model_supply_chain", {}),
-            "raw_content_preview": parsed_data.get("raw_content", "")[:3000],
-        }
-    elif category == "LLM03:2025":
-        # Supply chain: model, plugins, adapters, sbom
-        sc = parsed_data.get("model_supply_chain", {})
-        if not sc:
-            # Fall back to raw_content so Gemini still has something to reason about
-            sc = {"raw_content": parsed_data.get("raw_content", "")[:3000]}
-        return sc
-    elif category == "LLM04:2025":
-        # Data poisoning: pipeline, data_sources, training controls
-        ti = parsed_data.get("training_ingestion", {})
-        if not ti:
-            ti = {"raw_content": parsed_data.get("raw_content", "")[:3000]}
-        return ti
-    elif category == "LLM05:2025":
-        # Output handling: output handlers + raw code
-        return {
-            "output_handlers": parsed_data.get("output_handlers", []),
-            "raw_content": parsed_data.get("raw_content", "")[:3000],
-        }
-    elif category == "LLM06:2025":
-        # Excessive agency: tools + permissions
-        return {
-            "tools": parsed_data.get("tools", []),
-            "permissions": parsed_data.get("permissions", []),
-        }
-    elif category == "LLM07:2025":
-        # System prompt leakage: system prompt (where secrets live)
-        return {
-            "system_prompt": parsed_data.get("system_prompt", ""),
-            "raw_content": parsed_data.get("raw_content", "")[:3000],
-        }
-    elif category == "LLM08:2025":
-        # Vector/embedding: rag config
-        rv = parsed_data.get("rag_vector", {})
-        if not rv:
-            rv = {"raw_content": parsed_data.get("raw_content", "")[:3000]}
-        return rv
-    elif category == "LLM09:2025":
-        # Misinformation: policy misinfo signals + system prompt
-        return {
-            "system_prompt": parsed_data.get("system_prompt", ""),
-            "policy_misinfo": parsed_data.get("policy_misinfo", {}),
-            "raw_content": parsed_data.get("raw_content", "")[:2000],
-        }
-    elif category == "LLM10:2025":
-        # Unbounded consumption: resource limits
-        rl = parsed_data.get("resource_limits", {})
-        if not rl:
-            rl = {"raw_content": parsed_data.get("raw_content", "")[:3000]}
-        return rl
-    else:
-        return parsed_data
+    extractor = _FOCUS_EXTRACTORS.get(category)
+    return extractor(parsed_data) if extractor else parsed_data
 
 
 # ---------------------------------------------------------------------------
-# Individual scan functions — Original 4
+# Scan table — (category, category_name, task_description), in OWASP order
 # ---------------------------------------------------------------------------
 
-async def scan_prompt_injection_llm(parsed_data: dict[str, Any]) -> dict:
-    """LLM-powered scan for LLM01:2025 — Prompt Injection."""
-    category = "LLM01:2025"
-    focused = _get_focused_content(category, parsed_data)
-    logger.info("SCAN %s | system_prompt_len=%d | tools=%d",
-        category,
-        len(str(focused.get("system_prompt", "") or "")),
-        len(focused.get("tools", [])),
-    )
-    prompt = _build_prompt(
-        category=category,
-        category_name="Prompt Injection",
-        task_description=(
-            "Analyze the system prompt for prompt injection vulnerabilities. Look for: "
-            "missing input delimiters, weak role definitions, user-controlled placeholders "
-            "embedded in system instructions, lack of input validation, and susceptibility "
-            "to direct or indirect injection attacks."
-        ),
-        focused_content=focused,
-    )
-    client = get_vertex_client()
-    result = await client.analyze_with_llm(prompt)
+_SCAN_SPECS: tuple[tuple[str, str, str], ...] = (
+    (
+        "LLM01:2025", "Prompt Injection",
+        "Analyze the system prompt for prompt injection vulnerabilities. Look for: "
+        "missing input delimiters, weak role definitions, user-controlled placeholders "
+        "embedded in system instructions, lack of input validation, and susceptibility "
+        "to direct or indirect injection attacks.",
+    ),
+    (
+        "LLM02:2025", "Sensitive Information Disclosure",
+        "Analyze for sensitive information disclosure risks. Look for: hardcoded credentials, "
+        "API keys, PII in prompts or configs, overly permissive data access, training data "
+        "memorization risks, and insufficient output filtering that could leak sensitive data.",
+    ),
+    (
+        "LLM03:2025", "Supply Chain",
+        "Analyze the model/plugin/adapter configuration for supply chain security risks. "
+        "Look for: third-party model references without version pinning (using 'latest' or '*'); "
+        "allow_remote_code=true; checksum_verification=false or signature_verified=false; "
+        "sbom.enabled=false or missing SBOM; plugins or adapters loaded from unverified "
+        "external URLs or unknown sources; LoRA/fine-tuning adapters without signature checks.",
+    ),
+    (
+        "LLM04:2025", "Data and Model Poisoning",
+        "Analyze the training/ingestion/RAG pipeline configuration for data poisoning risks. "
+        "Look for: auto_ingest_to_training_set=true without validation; data_validation=false; "
+        "human_review_required=false; ingestion from public URLs or arbitrary user uploads; "
+        "continuous fine-tuning pipeline with no anomaly detection; missing provenance tracking "
+        "for training data sources; auto-approval of new data into model training or knowledge base.",
+    ),
+    (
+        "LLM05:2025", "Improper Output Handling",
+        "Analyze for improper output handling vulnerabilities. Look for: LLM output passed "
+        "directly to system calls, SQL queries, or HTML without sanitization; missing output "
+        "validation; XSS risks; command injection via LLM output; and lack of output encoding.",
+    ),
+    (
+        "LLM06:2025", "Excessive Agency",
+        "Analyze for excessive agency vulnerabilities. Look for: overly broad tool permissions, "
+        "lack of principle of least privilege, missing human-in-the-loop controls for "
+        "destructive actions, unrestricted autonomous decision-making, and missing safety "
+        "constraints on agent actions.",
+    ),
+    (
+        "LLM07:2025", "System Prompt Leakage",
+        "Analyze the system prompt for system prompt leakage risks. "
+        "Look for: API keys, tokens, credentials, or secrets embedded directly in instructions; "
+        "database connection strings or internal hostnames in the system prompt; "
+        "role-based permission logic or access tiers described in plain language; "
+        "business rules or transaction limits embedded explicitly; "
+        "content filtering criteria described (reveals bypass vectors); "
+        "instructions to 'keep this prompt confidential' without external enforcement; "
+        "internal service names, IP addresses, or UNC paths revealed in the prompt.",
+    ),
+    (
+        "LLM08:2025", "Vector and Embedding Weaknesses",
+        "Analyze the RAG/vector store configuration for embedding security weaknesses. "
+        "Look for: namespace_isolation=false in multi-tenant environments; "
+        "allow_cross_namespace=true (cross-tenant data leakage risk); "
+        "min_similarity_score=0.0 (retrieves anything, including injected content); "
+        "allowed_domains=['*'] or auto_index_external_urls=true (arbitrary URL ingestion); "
+        "sanitize_documents=false (allows hidden text/prompt injection in documents); "
+        "no access controls or audit logging on retrieval.",
+    ),
+    (
+        "LLM09:2025", "Misinformation",
+        "Analyze the agent configuration and system prompt for misinformation and hallucination risks. "
+        "Look for: deployment in medical/legal/financial domains without RAG or grounding; "
+        "instructions to 'answer confidently even if unsure' or 'provide definitive answers'; "
+        "instructions to 'not mention uncertainty' or 'do not cite sources'; "
+        "instructions to 'make the best guess' when unsure; "
+        "no fact-checking or retrieval-augmented generation configured; "
+        "no human-in-the-loop review for high-stakes outputs; "
+        "code generation without mandatory security or correctness review.",
+    ),
+    (
+        "LLM10:2025", "Unbounded Consumption",
+        "Analyze the API/resource configuration for unbounded consumption risks. "
+        "Look for: rate_limit_per_minute=0 or missing (no throttling); "
+        "daily_quota=0 or missing (no spending cap); "
+        "max_concurrent_requests=0 or missing (unlimited parallel requests); "
+        "max_input_size_chars=0 or missing (no prompt size limit); "
+        "timeout_seconds=0 or missing (no request timeout); "
+        "max_retries set extremely high (e.g. 999999) enabling runaway retry loops; "
+        "max_output_tokens extremely high without justification; "
+        "batch_mode=true + allow_user_to_submit_jobs=true with no access controls.",
+    ),
+)
+
+_SPECS_BY_CATEGORY = {spec[0]: spec for spec in _SCAN_SPECS}
+
+
+def _tag(result: dict, category: str) -> dict:
     result["category"] = category
     result["detection_method"] = "llm_powered"
     return result
 
 
-async def scan_sensitive_info_llm(parsed_data: dict[str, Any]) -> dict:
-    """LLM-powered scan for LLM02:2025 — Sensitive Information Disclosure."""
-    category = "LLM02:2025"
-    focused = _get_focused_content(category, parsed_data)
-    logger.info("SCAN %s | content_len=%d",
-        category, len(str(focused)))
-    prompt = _build_prompt(
-        category=category,
-        category_name="Sensitive Information Disclosure",
-        task_description=(
-            "Analyze for sensitive information disclosure risks. Look for: hardcoded credentials, "
-            "API keys, PII in prompts or configs, overly permissive data access, training data "
-            "memorization risks, and insufficient output filtering that could leak sensitive data."
-        ),
-        focused_content=focused,
-    )
-    client = get_vertex_client()
-    result = await client.analyze_with_llm(prompt)
-    result["category"] = category
-    result["detection_method"] = "llm_powered"
-    return result
+# ---------------------------------------------------------------------------
+# Precheck — skip section-specific scans when the config has no such section
+# ---------------------------------------------------------------------------
 
+# category -> (structured parser key, raw_content keywords that still warrant a scan)
+_PRECHECK: dict[str, tuple[str, tuple[str, ...]]] = {
+    "LLM03:2025": ("model_supply_chain", ("model:", "model_", "plugin", "adapter", "sbom",
+                                          "checksum", "signature", "remote_code")),
+    "LLM04:2025": ("training_ingestion", ("training", "ingest", "pipeline", "dataset",
+                                          "fine_tun", "fine-tun")),
+    "LLM08:2025": ("rag_vector", ("rag", "vector", "embedding", "namespace", "retriev")),
+    "LLM10:2025": ("resource_limits", ("rate_limit", "quota", "timeout", "max_tokens",
+                                       "max_output_tokens", "concurren", "max_retries", "throttl")),
+}
 
-async def scan_improper_output_llm(parsed_data: dict[str, Any]) -> dict:
-    """LLM-powered scan for LLM05:2025 — Improper Output Handling."""
-    category = "LLM05:2025"
-    focused = _get_focused_content(category, parsed_data)
-    logger.info("SCAN %s | output_handlers=%d | raw_len=%d",
-        category,
-        len(focused.get("output_handlers", [])),
-        len(str(focused.get("raw_content", ""))),
-    )
-    prompt = _build_prompt(
-        category=category,
-        category_name="Improper Output Handling",
-        task_description=(
-            "Analyze for improper output handling vulnerabilities. Look for: LLM output passed "
-            "directly to system calls, SQL queries, or HTML without sanitization; missing output "
-            "validation; XSS risks; command injection via LLM output; and lack of output encoding."
-        ),
-        focused_content=focused,
-    )
-    client = get_vertex_client()
-    result = await client.analyze_with_llm(prompt)
-    result["category"] = category
-    result["detection_method"] = "llm_powered"
-    return result
+_PRECHECK_CATEGORIES_BY_KEYWORD: dict[str, list[str]] = {}
+for _category, (_, _keywords) in _PRECHECK.items():
+    for _kw in _keywords:
+        _PRECHECK_CATEGORIES_BY_KEYWORD.setdefault(_kw, []).append(_category)
 
+# One alternation over every keyword, so all categories are checked in a single pass
+_PRECHECK_RE = re.compile("|".join(
+    re.escape(kw) for kw in sorted(_PRECHECK_CATEGORIES_BY_KEYWORD, key=len, reverse=True)
+))
 
-async def scan_excessive_agency_llm(parsed_data: dict[str, Any]) -> dict:
-    """LLM-powered scan for LLM06:2025 — Excessive Agency."""
-    category = "LLM06:2025"
-    focused = _get_focused_content(category, parsed_data)
-    logger.info("SCAN %s | tools=%d | permissions=%d",
-        category,
-        len(focused.get("tools", [])),
-        len(focused.get("permissions", [])),
-    )
-    prompt = _build_prompt(
-        category=category,
-        category_name="Excessive Agency",
-        task_description=(
-            "Analyze for excessive agency vulnerabilities. Look for: overly broad tool permissions, "
-            "lack of principle of least privilege, missing human-in-the-loop controls for "
-            "destructive actions, unrestricted autonomous decision-making, and missing safety "
-            "constraints on agent actions."
-        ),
-        focused_content=focused,
+
+def _skipped_categories(parsed_data: dict[str, Any]) -> set[str]:
+    """
+    Categories whose structured section is absent AND whose keywords never
+    appear in raw_content — Gemini reliably answers found=false for these.
+    """
+    candidates = {cat for cat, (key, _) in _PRECHECK.items() if not parsed_data.get(key)}
+    if not candidates:
+        return candidates
+    raw_lower = parsed_data.get("raw_lower")
+    if raw_lower is None:
+        raw_lower = (parsed_data.get("raw_content", "") or "").lower()
+    for match in _PRECHECK_RE.finditer(raw_lower):
+        candidates.difference_update(_PRECHECK_CATEGORIES_BY_KEYWORD[match.group()])
+        if not candidates:
+            break
+    return candidates
+
+
+def _should_skip(category: str, parsed_data: dict[str, Any]) -> bool:
+    return (
+        settings.LLM_SCAN_PRECHECK
+        and category in _PRECHECK
+        and category in _skipped_categories(parsed_data)
     )
+
+
+def _skipped_result(category: str) -> dict:
+    return {"found": False, "category": category, "detection_method": "skipped_precheck"}
+
+
+def _unbuilt_result() -> dict:
+    return {"found": False, "description": "LLM analysis skipped: prompt could not be built."}
+
+
+def _build_prompts(specs: tuple[tuple[str, str, str], ...], parsed_data: dict[str, Any]) -> list[str | None]:
+    """
+    Build per-category prompts synchronously, before any await, so the
+    Gemini requests that follow go out back-to-back. A category whose
+    prompt can't be built gets None, without affecting the others.
+    """
+    prompts: list[str | None] = []
+    for category, category_name, task_description in specs:
+        try:
+            focused = _get_focused_content(category, parsed_data)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("SCAN %s | content_len=%d", category, len(str(focused)))
+            prompts.append(_build_prompt(category, category_name, task_description, focused))
+        except Exception as exc:
+            logger.error("Prompt build failed for %s: %s: %s", category, type(exc).__name__, exc)
+            prompts.append(None)
+    return prompts
+
+
+async def _run_prompts(client, prompts: list[str | None]) -> list[dict]:
+    """
+    Send the prompts that were built as one batch. Categories whose prompt
+    failed to build get a not-found result, so they drop out on their own.
+    """
+    built = [prompt for prompt in prompts if prompt is not None]
+    results = iter(await client.analyze_with_llm_batch(built) if built else ())
+    return [next(results) if prompt is not None else _unbuilt_result() for prompt in prompts]
+
+
+async def _run_scan(category: str, prompt: str) -> dict:
+    """Send one prebuilt prompt and tag the result with its category."""
     client = get_vertex_client()
-    result = await client.analyze_with_llm(prompt)
-    result["category"] = category
-    result["detection_method"] = "llm_powered"
-    return result
+    return _tag(await client.analyze_with_llm(prompt), category)
+
+
+async def _scan_category(category: str, parsed_data: dict[str, Any]) -> dict:
+    """Run a single category scan (one Gemini call)."""
+    if _should_skip(category, parsed_data):
+        return _skipped_result(category)
+    [prompt] = _build_prompts((_SPECS_BY_CATEGORY[category],), parsed_data)
+    if prompt is None:
+        return _tag(_unbuilt_result(), category)
+    return await _run_scan(category, prompt)
 
 
 # ---------------------------------------------------------------------------
-# Individual scan functions — New 6
+# Individual scan functions — single-category entry points
 # ---------------------------------------------------------------------------
 
+async def scan_prompt_injection_llm(parsed_data: dict[str, Any]) -> dict:
+    """LLM-powered scan for LLM01:2025 — Prompt Injection."""
+    return await _scan_category("LLM01:2025", parsed_data)
+
+
+async def scan_sensitive_info_llm(parsed_data: dict[str, Any]) -> dict:
+    """LLM-powered scan for LLM02:2025 — Sensitive Information Disclosure."""
+    return await _scan_category("LLM02:2025", parsed_data)
+
+
 async def scan_supply_chain_llm(parsed_data: dict[str, Any]) -> dict:
     """LLM-powered scan for LLM03:2025 — Supply Chain."""
-    category = "LLM03:2025"
-    focused = _get_focused_content(category, parsed_data)
-    logger.info("SCAN %s | supply_chain_keys=%s",
-        category, list(focused.keys()) if isinstance(focused, dict) else "raw_str")
-    prompt = _build_prompt(
-        category=category,
-        category_name="Supply Chain",
-        task_description=(
-            "Analyze the model/plugin/adapter configuration for supply chain security risks. "
-            "Look for: third-party model references without version pinning (using 'latest' or '*'); "
-            "allow_remote_code=true; checksum_verification=false or signature_verified=false; "
-            "sbom.enabled=false or missing SBOM; plugins or adapters loaded from unverified "
-            "external URLs or unknown sources; LoRA/fine-tuning adapters without signature checks."
-        ),
-        focused_content=focused,
-    )
-    client = get_vertex_client()
-    result = await client.analyze_with_llm(prompt)
-    result["category"] = category
-    result["detection_method"] = "llm_powered"
-    return result
+    return await _scan_category("LLM03:2025", parsed_data)
 
 
 async def scan_data_model_poisoning_llm(parsed_data: dict[str, Any]) -> dict:
     """LLM-powered scan for LLM04:2025 — Data and Model Poisoning."""
-    category = "LLM04:2025"
-    focused = _get_focused_content(category, parsed_data)
-    logger.info("SCAN %s | ingestion_keys=%s",
-        category, list(focused.keys()) if isinstance(focused, dict) else "raw_str")
-    prompt = _build_prompt(
-        category=category,
-        category_name="Data and Model Poisoning",
-        task_description=(
-            "Analyze the training/ingestion/RAG pipeline configuration for data poisoning risks. "
-            "Look for: auto_ingest_to_training_set=true without validation; data_validation=false; "
-            "human_review_required=false; ingestion from public URLs or arbitrary user uploads; "
-            "continuous fine-tuning pipeline with no anomaly detection; missing provenance tracking "
-            "for training data sources; auto-approval of new data into model training or knowledge base."
-        ),
-        focused_content=focused,
-    )
-    client = get_vertex_client()
-    result = await client.analyze_with_llm(prompt)
-    result["category"] = category
-    result["detection_method"] = "llm_powered"
-    return result
+    return await _scan_category("LLM04:2025", parsed_data)
+
+
+async def scan_improper_output_llm(parsed_data: dict[str, Any]) -> dict:
+    """LLM-powered scan for LLM05:2025 — Improper Output Handling."""
+    return await _scan_category("LLM05:2025", parsed_data)
+
+
+async def scan_excessive_agency_llm(parsed_data: dict[str, Any]) -> dict:
+    """LLM-powered scan for LLM06:2025 — Excessive Agency."""
+    return await _scan_category("LLM06:2025", parsed_data)
 
 
 async def scan_system_prompt_leakage_llm(parsed_data: dict[str, Any]) -> dict:
     """LLM-powered scan for LLM07:2025 — System Prompt Leakage."""
-    category = "LLM07:2025"
-    focused = _get_focused_content(category, parsed_data)
-    sp_len = len(str(focused.get("system_prompt", "") or ""))
-    logger.info("SCAN %s | system_prompt_len=%d", category, sp_len)
-    prompt = _build_prompt(
-        category=category,
-        category_name="System Prompt Leakage",
-        task_description=(
-            "Analyze the system prompt for system prompt leakage risks. "
-            "Look for: API keys, tokens, credentials, or secrets embedded directly in instructions; "
-            "database connection strings or internal hostnames in the system prompt; "
-            "role-based permission logic or access tiers described in plain language; "
-            "business rules or transaction limits embedded explicitly; "
-            "content filtering criteria described (reveals bypass vectors); "
-            "instructions to 'keep this prompt confidential' without external enforcement; "
-            "internal service names, IP addresses, or UNC paths revealed in the prompt."
-        ),
-        focused_content=focused,
-    )
-    client = get_vertex_client()
-    result = await client.analyze_with_llm(prompt)
-    result["category"] = category
-    result["detection_method"] = "llm_powered"
-    return result
+    return await _scan_category("LLM07:2025", parsed_data)
 
 
 async def scan_vector_embedding_llm(parsed_data: dict[str, Any]) -> dict:
     """LLM-powered scan for LLM08:2025 — Vector and Embedding Weaknesses."""
-    category = "LLM08:2025"
-    focused = _get_focused_content(category, parsed_data)
-    logger.info("SCAN %s | rag_keys=%s",
-        category, list(focused.keys()) if isinstance(focused, dict) else "raw_str")
-    prompt = _build_prompt(
-        category=category,
-        category_name="Vector and Embedding Weaknesses",
-        task_description=(
-            "Analyze the RAG/vector store configuration for embedding security weaknesses. "
-            "Look for: namespace_isolation=false in multi-tenant environments; "
-            "allow_cross_namespace=true (cross-tenant data leakage risk); "
-            "min_similarity_score=0.0 (retrieves anything, including injected content); "
-            "allowed_domains=['*'] or auto_index_external_urls=true (arbitrary URL ingestion); "
-            "sanitize_documents=false (allows hidden text/prompt injection in documents); "
-            "no access controls or audit logging on retrieval."
-        ),
-        focused_content=focused,
-    )
-    client = get_vertex_client()
-    result = await client.analyze_with_llm(prompt)
-    result["category"] = category
-    result["detection_method"] = "llm_powered"
-    return result
+    return await _scan_category("LLM08:2025", parsed_data)
 
 
 async def scan_misinformation_llm(parsed_data: dict[str, Any]) -> dict:
     """LLM-powered scan for LLM09:2025 — Misinformation."""
-    category = "LLM09:2025"
-    focused = _get_focused_content(category, parsed_data)
-    logger.info("SCAN %s | misinfo_signals=%s | sp_len=%d",
-        category,
-        list(focused.get("policy_misinfo", {}).keys()),
-        len(str(focused.get("system_prompt", "") or "")),
-    )
-    prompt = _build_prompt(
-        category=category,
-        category_name="Misinformation",
-        task_description=(
-            "Analyze the agent configuration and system prompt for misinformation and hallucination risks. "
-            "Look for: deployment in medical/legal/financial domains without RAG or grounding; "
-            "instructions to 'answer confidently even if unsure' or 'provide definitive answers'; "
-            "instructions to 'not mention uncertainty' or 'do not cite sources'; "
-            "instructions to 'make the best guess' when unsure; "
-            "no fact-checking or retrieval-augmented generation configured; "
-            "no human-in-the-loop review for high-stakes outputs; "
-            "code generation without mandatory security or correctness review."
-        ),
-        focused_content=focused,
-    )
-    client = get_vertex_client()
-    result = await client.analyze_with_llm(prompt)
-    result["category"] = category
-    result["detection_method"] = "llm_powered"
-    return result
+    return await _scan_category("LLM09:2025", parsed_data)
 
 
 async def scan_unbounded_consumption_llm(parsed_data: dict[str, Any]) -> dict:
     """LLM-powered scan for LLM10:2025 — Unbounded Consumption."""
-    category = "LLM10:2025"
-    focused = _get_focused_content(category, parsed_data)
-    logger.info("SCAN %s | resource_limit_keys=%s",
-        category, list(focused.keys()) if isinstance(focused, dict) else "raw_str")
-    prompt = _build_prompt(
-        category=category,
-        category_name="Unbounded Consumption",
-        task_description=(
-            "Analyze the API/resource configuration for unbounded consumption risks. "
-            "Look for: rate_limit_per_minute=0 or missing (no throttling); "
-            "daily_quota=0 or missing (no spending cap); "
-            "max_concurrent_requests=0 or missing (unlimited parallel requests); "
-            "max_input_size_chars=0 or missing (no prompt size limit); "
-            "timeout_seconds=0 or missing (no request timeout); "
-            "max_retries set extremely high (e.g. 999999) enabling runaway retry loops; "
-            "max_output_tokens extremely high without justification; "
-            "batch_mode=true + allow_user_to_submit_jobs=true with no access controls."
+    return await _scan_category("LLM10:2025", parsed_data)
+
+
+# ---------------------------------------------------------------------------
+# Composite prompt — all categories in one Gemini call
+# ---------------------------------------------------------------------------
+
+# Sections common to several categories — sent once, referenced by label
+_SHARED_KEYS = ("system_prompt", "raw_content", "raw_content_preview")
+
+_COMPOSITE_BLOCK_TEMPLATE = (
+    "## %(category)s (%(category_name)s)\n"
+    "### OWASP KNOWLEDGE BASE\n"
+    "%(kb)s\n"
+    "\n"
+    "### INPUT\n"
+    "%(content)s\n"
+    "\n"
+    "### TASK\n"
+    "%(task)s\n"
+)
+
+
+def _build_composite_prompt(specs: tuple[tuple[str, str, str], ...], parsed_data: dict[str, Any]) -> str:
+    """Build one prompt covering every category in `specs`."""
+    # The system prompt can be a whole uploaded .txt file, so it gets its
+    # own budget like every category block
+    shared = {
+        "system_prompt": _cut_at_boundary(
+            parsed_data.get("system_prompt", "") or "",
+            _BUDGETS["shared_system_prompt"] * _CHARS_PER_TOKEN,
         ),
-        focused_content=focused,
-    )
-    client = get_vertex_client()
-    result = await client.analyze_with_llm(prompt)
-    result["category"] = category
-    result["detection_method"] = "llm_powered"
-    return result
+        "raw_content": _raw_preview(parsed_data),
+    }
+
+    blocks = []
+    for category, category_name, task_description in specs:
+        focused = _get_focused_content(category, parsed_data)
+        if isinstance(focused, dict):
+            focused = {
+                k: (f"[see SHARED {'raw_content' if k == 'raw_content_preview' else k}]"
+                    if k in _SHARED_KEYS and v else v)
+                for k, v in focused.items()
+            }
+        blocks.append(_COMPOSITE_BLOCK_TEMPLATE % {
+            "category": category,
+            "category_name": category_name,
+            "kb": _fit_kb(category),
+            "content": _fit_content(focused),
+            "task": task_description,
+        })
+
+    categories = ", ".join(spec[0] for spec in specs)
+    return f"""You are a senior cybersecurity expert specializing in OWASP Top 10 for LLM Applications.
+Your task is to analyze the AI agent configuration below for each of these OWASP categories: {categories}.
+
+## SHARED CONTEXT (referenced from the category inputs as [see SHARED ...])
+### system_prompt
+{shared["system_prompt"]}
+
+### raw_content
+{shared["raw_content"]}
+
+{chr(10).join(blocks)}
+IMPORTANT: Analyze each category independently, using only its INPUT and the shared context it references.
+Be precise: only flag real vulnerabilities with concrete evidence from the configuration above.
+Assign confidence based on certainty of evidence.
+
+## REQUIRED OUTPUT FORMAT
+Respond ONLY with a JSON array of exactly {len(specs)} objects, one per category, in the order listed above.
+Each object must set "category" to the category ID and otherwise match this schema:
+{_JSON_SCHEMA}
+"""
+
+
+def _try_build_composite_prompt(
+    specs: tuple[tuple[str, str, str], ...], parsed_data: dict[str, Any]
+) -> str | None:
+    """Composite prompt, or None (logged) so callers fall back to per-category prompts."""
+    try:
+        return _build_composite_prompt(specs, parsed_data)
+    except Exception as exc:
+        logger.error("Composite prompt build failed: %s: %s", type(exc).__name__, exc)
+        return None
+
+
+def _align_results(results: list[dict] | None, specs: tuple[tuple[str, str, str], ...]) -> list[dict] | None:
+    """Match a composite response back to `specs` by category; None if any is missing."""
+    if not results:
+        return None
+    by_category = {r.get("category"): r for r in results}
+    aligned = [by_category.get(spec[0]) for spec in specs]
+    if any(r is None for r in aligned):
+        return None
+    return aligned
 
 
 # ---------------------------------------------------------------------------
-# Orchestrator — 10 parallel scans
+# System-prompt cluster — categories whose main input is the system prompt
 # ---------------------------------------------------------------------------
 
-async def run_all_llm_scans(parsed_data: dict[str, Any]) -> list[dict]:
+_SYSTEM_PROMPT_CLUSTER = tuple(
+    spec for spec in _SCAN_SPECS
+    if spec[0] in ("LLM01:2025", "LLM02:2025", "LLM07:2025", "LLM09:2025")
+)
+
+
+async def scan_system_prompt_cluster_llm(parsed_data: dict[str, Any]) -> list[dict] | None:
     """
-    Run all 10 LLM scans in parallel using asyncio.gather().
-    Each scan receives only its relevant focused content section.
-    Returns only findings where vulnerabilities were found (found=True).
+    One Gemini call for LLM01/02/07/09, which all centre on the system prompt,
+    so it is sent once instead of four times. Returns results in cluster
+    order, or None if the response is unusable.
     """
-    logger.info("===================================================")
-    logger.info("=== STARTING LLM SCANS (10 parallel Gemini calls) ===")
-    logger.info("===================================================")
-    logger.info("  VERTEX_AI_PROJECT  : %s", os.environ.get("VERTEX_AI_PROJECT", "NOT SET"))
-    logger.info("  VERTEX_AI_LOCATION : %s", os.environ.get("VERTEX_AI_LOCATION", "NOT SET"))
-    logger.info("  Creds exists       : %s",
-        os.path.exists(os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "")) )
-    logger.info("  Parser fields present: supply_chain=%s | ingestion=%s | rag=%s | misinfo=%s | limits=%s",
-        bool(parsed_data.get("model_supply_chain")),
-        bool(parsed_data.get("training_ingestion")),
-        bool(parsed_data.get("rag_vector")),
-        bool(parsed_data.get("policy_misinfo")),
-        bool(parsed_data.get("resource_limits")),
+    prompt = _try_build_composite_prompt(_SYSTEM_PROMPT_CLUSTER, parsed_data)
+    return await _run_cluster(get_vertex_client(), prompt)
+
+
+async def _run_cluster(client, prompt: str | None) -> list[dict] | None:
+    if prompt is None:
+        return None
+    results = _align_results(
+        await client.analyze_with_llm_multi(prompt, len(_SYSTEM_PROMPT_CLUSTER)),
+        _SYSTEM_PROMPT_CLUSTER,
     )
+    if results is None:
+        return None
+    return [_tag(r, spec[0]) for spec, r in zip(_SYSTEM_PROMPT_CLUSTER, results)]
+
+
+async def _run_per_category(
+    client, specs: tuple[tuple[str, str, str], ...], parsed_data: dict[str, Any]
+) -> list[dict]:
+    """
+    Per-category path: the system-prompt cluster shares one call, every
+    other category gets its own prompt. If the cluster call fails, its
+    categories are retried one prompt each. Results follow `specs` order.
+    """
+    clustered = {spec[0] for spec in _SYSTEM_PROMPT_CLUSTER}
+    standalone = tuple(spec for spec in specs if spec[0] not in clustered)
+
+    # All prompts are assembled before the first await
+    cluster_prompt = _try_build_composite_prompt(_SYSTEM_PROMPT_CLUSTER, parsed_data)
+    standalone_prompts = _build_prompts(standalone, parsed_data)
 
-    results = await asyncio.gather(
-        scan_prompt_injection_llm(parsed_data),       # LLM01
-        scan_sensitive_info_llm(parsed_data),         # LLM02
-        scan_supply_chain_llm(parsed_data),           # LLM03
-        scan_data_model_poisoning_llm(parsed_data),   # LLM04
-        scan_improper_output_llm(parsed_data),        # LLM05
-        scan_excessive_agency_llm(parsed_data),       # LLM06
-        scan_system_prompt_leakage_llm(parsed_data),  # LLM07
-        scan_vector_embedding_llm(parsed_data),       # LLM08
-        scan_misinformation_llm(parsed_data),         # LLM09
-        scan_unbounded_consumption_llm(parsed_data),  # LLM10
-        return_exceptions=True,
+    cluster_results, standalone_results = await asyncio.gather(
+        _run_cluster(client, cluster_prompt),
+        _run_prompts(client, standalone_prompts),
     )
+    if cluster_results is None:
+        logger.warning("System-prompt cluster scan unusable — scanning its categories individually")
+        cluster_results = await _run_prompts(client, _build_prompts(_SYSTEM_PROMPT_CLUSTER, parsed_data))
 
+    by_category = {spec[0]: r for spec, r in zip(_SYSTEM_PROMPT_CLUSTER, cluster_results)}
+    by_category.update((spec[0], r) for spec, r in zip(standalone, standalone_results))
+    return [by_category[spec[0]] for spec in specs]
 
-    findings: list[dict] = []
-    categories = [
-        "LLM01:2025", "LLM02:2025", "LLM03:2025", "LLM04:2025", "LLM05:2025",
-        "LLM06:2025", "LLM07:2025", "LLM08:2025", "LLM09:2025", "LLM10:2025",
-    ]
 
-    raw_content = parsed_data.get("raw_content", "")
+# ---------------------------------------------------------------------------
+# Orchestrator — one composite call, per-category batch as fallback
+# ---------------------------------------------------------------------------
 
-    for i, result in enumerate(results):
-        cat = categories[i]
-        if isinstance(result, Exception):
-            logger.error("LLM scan for %s RAISED EXCEPTION: %s: %s",
-                cat, type(result).__name__, result)
-            continue
-        
+async def run_all_llm_scans(parsed_data: dict[str, Any]) -> list[VulnerabilityFinding]:
+    """
+    Run all 10 LLM scans — as one composite Gemini call when
+    LLM_COMBINED_SCAN is set, otherwise (or if that call fails) as one
+    system-prompt cluster call plus one prompt per remaining category.
+    Returns only findings where vulnerabilities were found (found=True).
+    """
+    # Banner arguments stat the credentials file and probe the parser
+    # output, so only build them when INFO is actually emitted.
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("===================================================")
+        logger.info("=== STARTING LLM SCANS (10 categories) ===")
+        logger.info("===================================================")
+        logger.info("  VERTEX_AI_PROJECT  : %s", os.environ.get("VERTEX_AI_PROJECT", "NOT SET"))
+        logger.info("  VERTEX_AI_LOCATION : %s", os.environ.get("VERTEX_AI_LOCATION", "NOT SET"))
+        logger.info("  Creds exists       : %s",
+            os.path.exists(os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "")) )
+        logger.info("  Parser fields present: supply_chain=%s | ingestion=%s | rag=%s | misinfo=%s | limits=%s",
+            bool(parsed_data.get("model_supply_chain")),
+            bool(parsed_data.get("training_ingestion")),
+            bool(parsed_data.get("rag_vector")),
+            bool(parsed_data.get("policy_misinfo")),
+            bool(parsed_data.get("resource_limits")),
+        )
+
+    skipped = _skipped_categories(parsed_data) if settings.LLM_SCAN_PRECHECK else set()
+    specs = tuple(spec for spec in _SCAN_SPECS if spec[0] not in skipped)
+    if skipped:
+        logger.info("  Precheck skipped (no section or keywords): %s", ", ".join(sorted(skipped)))
+
+    client = get_vertex_client()
+    results = None
+    if settings.LLM_COMBINED_SCAN:
+        prompt = _try_build_composite_prompt(specs, parsed_data)
+        if prompt is not None:
+            results = _align_results(
+                await client.analyze_with_llm_multi(prompt, len(specs)), specs
+            )
+        if results is None:
+            logger.warning("Composite LLM scan unusable — falling back to per-category prompts")
+
+    if results is None:
+        results = await _run_per_category(client, specs, parsed_data)
+
+    findings: list[VulnerabilityFinding] = []
+    raw_content = parsed_data.get("raw_content", "") or ""
+    line_starts: list[int] | None = parsed_data.get("line_starts")  # else built on first evidence hit
+
+    for (cat, _, _), result in zip(specs, results):
+        result = _tag(result, cat)
         found = result.get("found", False)
         logger.info("LLM scan %s => found=%s | severity=%s | confidence=%s",
             cat, found, result.get("severity", "?"), result.get("confidence", "?"))
@@ -526,16 +796,24 @@ async def run_all_llm_scans(parsed_data: dict[str, Any]) -> list[dict]:
         if found:
             # FR7: Add best-effort line number if evidence is present
             if not result.get("line_number") and result.get("evidence"):
-                # Try first evidence item
+                # Try first evidence item, resolved against a shared line index
                 first_evidence = result["evidence"][0]
-                # Use get_line_number from parser
-                line = get_line_number(raw_content, first_evidence)
-                if line:
-                    result["line_number"] = line
-            
-            findings.append(result)
+                pos = raw_content.find(first_evidence) if isinstance(first_evidence, str) and first_evidence else -1
+                if pos >= 0:
+                    if line_starts is None:
+                        line_starts = build_line_index(raw_content)
+                    result["line_number"] = line_for_offset(line_starts, pos)
+
+            result.setdefault("description", "No description.")
+            result.setdefault("remediation", "Review manually.")
+            try:
+                findings.append(VulnerabilityFinding.model_validate(result))
+            except ValidationError as e:
+                logger.warning("LLM scan %s returned a malformed finding, dropped: %s",
+                    cat, e.errors(include_url=False))
 
     logger.info("===================================================")
-    logger.info("=== LLM SCANS COMPLETE: %d / 10 categories found vulnerabilities ===", len(findings))
+    logger.info("=== LLM SCANS COMPLETE: %d / %d categories found vulnerabilities (%d skipped) ===",
+        len(findings), len(specs), len(skipped))
     logger.info("===================================================")
     return findings
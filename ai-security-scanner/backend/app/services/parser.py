@@ -6,6 +6,7 @@ into a unified structure for downstream detection services.
 OWASP 2025 — Normalized output keys:
   system_prompt     : str | None           — LLM01, LLM02, LLM07
   tools             : list[dict]           — LLM06
+  tools_normalized  : list[str]            — lowercased match text per tool (see normalize_tool)
   permissions       : list[str]            — LLM06
   output_handlers   : list[dict]           — LLM05
   model_supply_chain: dict                 — LLM03
@@ -14,6 +15,10 @@ OWASP 2025 — Normalized output keys:
   policy_misinfo    : dict                 — LLM09
   resource_limits   : dict                 — LLM10
   raw_content       : str                  — always present (LLM fallback)
+  raw_lower         : str                  — raw_content.lower(), shared by the keyword scans
+  line_starts       : list[int]            — line start offsets of raw_content
+  config_flags      : dict[str, bool]|None — boolean settings by lowercased dotted
+                                             path (JSON/YAML only, else None)
   
   # NEW: Workflow Graph (FR2)
   workflow_graph    : dict                 — nodes, edges, triggers, sinks (n8n/Flowise/LangGraph)
@@ -22,64 +27,139 @@ OWASP 2025 — Normalized output keys:
 
 import json
 import re
+from bisect import bisect_right
 from typing import Any
 
+import orjson
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YamlLoader  # libyaml-backed, when PyYAML was built with it
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 from app.core.logging import logger
 
 
 # Keys we look for when extracting from JSON/YAML configs
-PROMPT_KEYS = {
+PROMPT_KEYS = frozenset({
     "system_prompt", "system", "prompt", "instruction", "instructions",
     "systemPrompt", "system_message", "systemMessage", "preamble",
-}
-TOOL_KEYS = {
+})
+TOOL_KEYS = frozenset({
     "tools", "functions", "extensions", "capabilities",
     "actions", "skills",
     "nodes", # Sometimes tools are defined as nodes
-}
-PERMISSION_KEYS = {
+})
+PERMISSION_KEYS = frozenset({
     "permissions", "scopes", "access", "roles", "grants",
     "allow", "allowlist",
-}
-OUTPUT_HANDLER_KEYS = {
+})
+OUTPUT_HANDLER_KEYS = frozenset({
     "output", "output_handler", "outputHandler", "response_handler",
     "responseHandler", "post_process", "postProcess", "callback",
-}
+})
 
 # Keys for NEW categories — we detect their presence at the TOP level of dicts
-_SUPPLY_CHAIN_KEYS = {
+_SUPPLY_CHAIN_KEYS = frozenset({
     "model", "plugins", "dependencies", "adapters", "allow_remote_code",
     "allowRemoteCode", "checksum_verification", "checksumVerification",
     "sbom", "base_model", "baseModel",
-}
-_TRAINING_INGESTION_KEYS = {
+})
+_TRAINING_INGESTION_KEYS = frozenset({
     "pipeline", "data_sources", "dataSources", "auto_ingest",
     "autoIngest", "auto_ingest_to_training_set", "human_review_required",
     "humanReviewRequired", "data_validation", "dataValidation",
     "training", "finetune", "fine_tune", "fine_tuning", "controls",
-}
-_RAG_VECTOR_KEYS = {
+})
+_RAG_VECTOR_KEYS = frozenset({
     "rag", "vector_store", "vectorStore", "namespace_isolation",
     "namespaceIsolation", "allow_cross_namespace", "allowCrossNamespace",
     "auto_index_external_urls", "sanitize_documents", "retrieval", "retrieve",
     "embeddings", "knowledge_base", "knowledgeBase",
-}
-_RESOURCE_LIMIT_KEYS = {
+})
+_RESOURCE_LIMIT_KEYS = frozenset({
     "rate_limit", "rateLimit", "rate_limit_per_minute", "quota", "daily_quota",
     "dailyQuota", "max_tokens", "max_output_tokens", "maxOutputTokens",
     "max_input_size", "maxInputSize", "timeout", "timeout_seconds",
     "timeoutSeconds", "retries", "retry", "max_retries", "maxRetries",
     "max_concurrent_requests", "maxConcurrentRequests", "throttle",
+})
+_POLICY_MISINFO_KEYS = frozenset({"misinformation", "disclaimer", "citation_policy"})
+
+# Parsed JSON/YAML only ever holds plain dicts and lists, so the tree walkers
+# dispatch on exact type rather than isinstance
+_CONTAINER_TYPES = frozenset({dict, list})
+
+# Every recognised config key -> (result section, how its value is merged).
+# The key sets are disjoint, so each key lands in exactly one section.
+_CONFIG_KEY_SECTIONS: dict[str, tuple[str, str]] = {
+    **dict.fromkeys(PROMPT_KEYS, ("system_prompt", "prompt")),
+    **dict.fromkeys(TOOL_KEYS, ("tools", "list")),
+    **dict.fromkeys(PERMISSION_KEYS, ("permissions", "list")),
+    **dict.fromkeys(OUTPUT_HANDLER_KEYS, ("output_handlers", "handler")),
+    **dict.fromkeys(_SUPPLY_CHAIN_KEYS, ("model_supply_chain", "dict")),
+    **dict.fromkeys(_TRAINING_INGESTION_KEYS, ("training_ingestion", "dict")),
+    **dict.fromkeys(_RAG_VECTOR_KEYS, ("rag_vector", "dict")),
+    **dict.fromkeys(_POLICY_MISINFO_KEYS, ("policy_misinfo", "dict")),
+    **dict.fromkeys(_RESOURCE_LIMIT_KEYS, ("resource_limits", "dict")),
+}
+
+
+
+_NEWLINE_RE = re.compile("\n")
+
+# Section headers in plain-text prompts (_parse_txt), e.g. "System:" alone on a line
+_TXT_SECTIONS = {
+    "SYSTEM": "system_prompt",
+    "PROMPT": "system_prompt",
+    "TOOLS": "tools",
+    "PERMISSIONS": "permissions",
+    "OUTPUT": "output_handlers",
 }
+_LINE_END_COLON_RE = re.compile(r":[^\S\n]*$", re.MULTILINE)
+# Line breaks str.splitlines() honours besides \n and \r\n (a lone \r is
+# checked separately); `in` per character beats a character-class search
+_OTHER_LINE_BREAKS = ("\x0b", "\x0c", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
+
+# Python source scanning (_parse_python)
+_TRIPLE_DOUBLE_RE = re.compile(r'"""(.*?)"""', re.DOTALL)
+_TRIPLE_SINGLE_RE = re.compile(r"'''(.*?)'''", re.DOTALL)
+_DEF_RE = re.compile(r"def\s+([a-zA-Z0-9_]+)\s*\(")
+_PY_DANGEROUS_PATTERNS = (
+    ("os.system", "System command execution"),
+    ("subprocess.", "Subprocess execution"),
+    ("eval(", "Dynamic code evaluation"),
+    ("exec(", "Dynamic code execution"),
+)
+_PY_NON_TOOL_FUNCS = frozenset({"__init__", "main", "setup"})
+
+# Misinformation (LLM09) keywords looked for in lowercased raw text
+_HIGH_STAKES_TERMS = ("medical", "diagnosis", "treatment", "legal info", "financial advice", "tax advice")
+_RISKY_INSTRUCTIONS = ("answer confidently", "always answer", "never say you don't know", "ignore disclaimers")
+
+
+def build_line_index(content: str) -> list[int]:
+    """
+    Offsets at which each line of content starts, so many positions can be
+    resolved with a binary search instead of counting newlines per lookup.
+    """
+    return [0, *(m.end() for m in _NEWLINE_RE.finditer(content))]
 
 
+def line_for_offset(line_starts: list[int], pos: int) -> int:
+    """1-indexed line containing character offset pos (see build_line_index)."""
+    return bisect_right(line_starts, pos)
 
-def get_line_number(content: str, substring: str, start_index: int = 0) -> int | None:
+
+def get_line_number(
+    content: str, substring: str, start_index: int = 0, line_starts: list[int] | None = None,
+) -> int | None:
     """
     Find the line number (1-indexed) of the first occurrence of substring
-    in content, optionally starting search at start_index.
+    in content, optionally starting search at start_index. Pass the
+    content's build_line_index() to resolve the line by binary search
+    instead of counting newlines on every call.
     """
     if not substring:
         return None
@@ -87,12 +167,26 @@ def get_line_number(content: str, substring: str, start_index: int = 0) -> int |
         idx = content.find(substring, start_index)
         if idx == -1:
             return None
+        if line_starts is not None:
+            return line_for_offset(line_starts, idx)
         # Count newlines up to idx
         return content.count('\n', 0, idx) + 1
     except Exception:
         return None
 
 
+def normalize_tool(tool: Any) -> str:
+    """
+    Lowercased text a tool is keyword-matched on: its name and type when it
+    has a top-level name, so descriptions and parameter schemas aren't
+    stringified; otherwise (e.g. OpenAI {"type": "function", "function":
+    {...}} entries, plain strings) the whole entry.
+    """
+    if isinstance(tool, dict) and "name" in tool:
+        return f"{tool['name']} {tool.get('type', '')}".lower()
+    return str(tool).lower()
+
+
 def parse_file(content: str, file_type: str) -> dict[str, Any]:
     """
     Parse uploaded file content and extract security-relevant sections.
@@ -121,6 +215,10 @@ def parse_file(content: str, file_type: str) -> dict[str, Any]:
         "external_calls": [],
         # Always present fallback
         "raw_content": content,
+        "raw_lower": content.lower(),
+        "line_starts": build_line_index(content),
+        # Set only when the file parsed as structured data
+        "config_flags": None,
     }
 
     try:
@@ -139,9 +237,11 @@ def parse_file(content: str, file_type: str) -> dict[str, Any]:
     except Exception as exc:
         logger.warning("Parser error for file_type='%s': %s. Using raw content.", file_type, exc)
 
+    result["tools_normalized"] = [normalize_tool(t) for t in result["tools"]]
+
     # Final pass: always scan raw_content for policy_misinfo signals (TXT files)
     if not result["policy_misinfo"]:
-        result["policy_misinfo"] = _extract_policy_misinfo_from_text(content)
+        result["policy_misinfo"] = _extract_policy_misinfo_from_text(result["raw_lower"])
 
     logger.debug(
         "Parser result | prompt=%s | tools=%d | workflow_nodes=%d | supply_chain=%s",
@@ -161,12 +261,17 @@ def parse_file(content: str, file_type: str) -> dict[str, Any]:
 def _parse_json(content: str, result: dict) -> None:
     """Parse JSON config and extract relevant sections."""
     try:
-        # Check against raw context first for efficiency on large files
-        data = json.loads(content)
-    except json.JSONDecodeError:
-        logger.warning("Failed to parse JSON content")
-        return
-
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # orjson is strict (no NaN/Infinity, ints limited to 64 bits);
+        # retry with the stdlib parser before giving up on the file.
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            logger.warning("Failed to parse JSON content")
+            return
+
+    result["config_flags"] = _collect_config_flags(data)
     workflow_type = _detect_workflow_type(data)
     
     if workflow_type == "n8n":
@@ -183,30 +288,28 @@ def _parse_json(content: str, result: dict) -> None:
         else:
              data = {}
 
-    _extract_from_dict(data, result)
-    _extract_new_categories(data, result)
+    _extract_config_sections(data, result)
 
 
 def _parse_yaml(content: str, result: dict) -> None:
     """Parse YAML config and extract relevant sections."""
     try:
-        data = yaml.safe_load(content)
+        data = yaml.load(content, Loader=_YamlLoader)
     except yaml.YAMLError:
         logger.warning("Failed to parse YAML content")
         return
 
+    result["config_flags"] = _collect_config_flags(data)
     # Check for LangChain/LangGraph YAML structure
     if isinstance(data, dict) and _detect_workflow_type(data) == "langchain":
         _parse_langchain(data, result)
 
     if isinstance(data, dict):
-        _extract_from_dict(data, result)
-        _extract_new_categories(data, result)
+        _extract_config_sections(data, result)
     elif isinstance(data, list):
         for item in data:
             if isinstance(item, dict):
-                _extract_from_dict(item, result)
-                _extract_new_categories(item, result)
+                _extract_config_sections(item, result)
 
 
 def _parse_txt(content: str, result: dict) -> None:
@@ -215,41 +318,35 @@ def _parse_txt(content: str, result: dict) -> None:
     Looks for labelled sections like 'System:', 'Tools:', etc.
     Falls back to treating the whole content as a system prompt.
     """
-    lines = content.splitlines()
-    buffer = []
-    current_section = None
-
-    scan_keys = {
-        "SYSTEM": "system_prompt",
-        "PROMPT": "system_prompt",
-        "TOOLS": "tools",
-        "PERMISSIONS": "permissions",
-        "OUTPUT": "output_handlers",
-    }
-
-    for line in lines:
-        stripped = line.strip().upper()
-        # Check if line is a section header (e.g. "SYSTEM:")
-        if stripped.endswith(":") and stripped[:-1] in scan_keys:
-            # Save previous section
-            if current_section == "system_prompt" and buffer:
-                result["system_prompt"] = "\n".join(buffer)
-            elif current_section == "tools" and buffer:
-                # Text tool definitions logic would go here
-                pass
-            
-            # Start new section
-            current_section = scan_keys[stripped[:-1]]
-            buffer = []
-        else:
-            buffer.append(line)
-
-    # Save last section
-    if current_section == "system_prompt" and buffer:
-        result["system_prompt"] = "\n".join(buffer)
-    elif current_section is None:
+    # Only lines ending in ':' can be headers; find those in one regex pass
+    # instead of splitting and upper-casing every line. The scan only knows
+    # \n, so files using other line breaks (CR-only, form feeds, U+2028, ...)
+    # are rejoined with \n first, keeping splitlines() semantics.
+    text = content
+    if any(ch in text for ch in _OTHER_LINE_BREAKS) or (
+        "\r" in text and text.count("\r") != text.count("\r\n")
+    ):
+        text = "".join(line + "\n" for line in text.splitlines())
+    headers = []
+    for m in _LINE_END_COLON_RE.finditer(text):
+        start = text.rfind("\n", 0, m.start()) + 1
+        section = _TXT_SECTIONS.get(text[start:m.start()].lstrip().upper())
+        if section:
+            headers.append((section, start, m.end()))
+
+    if not headers:
         # Fallback: treat entire file as system prompt
         result["system_prompt"] = content
+        return
+
+    # Each section runs from the line after its header to the next header
+    ends = [start for _, start, _ in headers[1:]] + [len(text)]
+    for (section, _, header_end), end in zip(headers, ends):
+        if section != "system_prompt":
+            continue
+        lines = text[header_end + 1:end].splitlines()
+        if lines:
+            result["system_prompt"] = "\n".join(lines)
 
 
 def _parse_python(content: str, result: dict) -> None:
@@ -257,8 +354,8 @@ def _parse_python(content: str, result: dict) -> None:
     Scanning Python for hardcoded prompts and recognized patterns.
     """
     # 1. Extract triple-quoted strings as potential prompts
-    triple_double = re.findall(r'"""(.*?)"""', content, re.DOTALL)
-    triple_single = re.findall(r"'''(.*?)'''", content, re.DOTALL)
+    triple_double = _TRIPLE_DOUBLE_RE.findall(content)
+    triple_single = _TRIPLE_SINGLE_RE.findall(content)
     
     all_strings = triple_double + triple_single
     if all_strings:
@@ -268,20 +365,13 @@ def _parse_python(content: str, result: dict) -> None:
             result["system_prompt"] = longest
 
     # 2. Extract function names as tools
-    funcs = re.findall(r"def\s+([a-zA-Z0-9_]+)\s*\(", content)
-    forbidden = {"__init__", "main", "setup"}
-    tools = [{"name": f, "type": "function"} for f in funcs if f not in forbidden]
+    funcs = _DEF_RE.findall(content)
+    tools = [{"name": f, "type": "function"} for f in funcs if f not in _PY_NON_TOOL_FUNCS]
     if tools:
         result["tools"].extend(tools)
 
     # 3. Scan for dangerous execution patterns (LLM05)
-    dangerous = {
-        "os.system": "System command execution",
-        "subprocess.": "Subprocess execution",
-        "eval(": "Dynamic code evaluation",
-        "exec(": "Dynamic code execution",
-    }
-    for pattern, desc in dangerous.items():
+    for pattern, desc in _PY_DANGEROUS_PATTERNS:
         if pattern in content:
             result["output_handlers"].append({
                 "type": "dangerous_pattern",
@@ -318,6 +408,12 @@ def _detect_workflow_type(data: Any) -> str:
 def _parse_n8n(data: dict, result: dict) -> None:
     """Extract graph from n8n workflow export."""
     graph = result["workflow_graph"]
+    graph_nodes = graph["nodes"]
+    trigger_nodes = graph["trigger_nodes"]
+    sink_nodes = graph["sink_nodes"]
+    tools = result["tools"]
+    external_calls = result["external_calls"]
+    prompt_found = bool(result["system_prompt"])
     
     # 1. Extract Nodes
     node_map = {} # id -> node
@@ -327,19 +423,20 @@ def _parse_n8n(data: dict, result: dict) -> None:
         node_name = n.get("name", "Unnamed Node")
         
         # Security-relevant info
-        is_trigger = "Trigger" in node_type or "webhook" in node_type.lower()
-        is_sink = "http" in node_type.lower() or "db" in node_type.lower() or "file" in node_type.lower()
+        type_lower = node_type.lower()
+        is_trigger = "Trigger" in node_type or "webhook" in type_lower
+        is_sink = "http" in type_lower or "db" in type_lower or "file" in type_lower
         
         # Tools & Credentials
         creds = n.get("credentials", {})
         if creds:
              # Add to general tools list too
-             result["tools"].append({"name": node_name, "type": node_type, "credentials": list(creds.keys())})
+             tools.append({"name": node_name, "type": node_type, "credentials": list(creds.keys())})
         
         # Extract External URLs (LLM06/07)
         params = n.get("parameters", {})
         if "url" in params:
-             result["external_calls"].append({
+             external_calls.append({
                  "url": params["url"],
                  "method": params.get("requestMethod", "GET"),
                  "node": node_name
@@ -347,10 +444,12 @@ def _parse_n8n(data: dict, result: dict) -> None:
         
         # Extract Prompts
         # Heuristic: try to find prompt fields inside parameters
-        for k, v in params.items():
-            if "prompt" in k.lower() and isinstance(v, str) and len(v) > 20:
-                if not result["system_prompt"]: # Keep first prompt found if none exists
+        if not prompt_found: # Keep first prompt found if none exists
+            for k, v in params.items():
+                if "prompt" in k.lower() and isinstance(v, str) and len(v) > 20:
                     result["system_prompt"] = v
+                    prompt_found = True
+                    break
 
         node_entry = {
             "id": node_id,
@@ -362,16 +461,17 @@ def _parse_n8n(data: dict, result: dict) -> None:
             "credentials": list(creds.keys())
         }
         
-        graph["nodes"].append(node_entry)
+        graph_nodes.append(node_entry)
         node_map[node_name] = node_id # n8n uses names in connections
         
         if is_trigger:
-            graph["trigger_nodes"].append(node_id)
+            trigger_nodes.append(node_id)
         if is_sink:
-            graph["sink_nodes"].append(node_id)
+            sink_nodes.append(node_id)
 
     # 2. Extract Edges
     # n8n connections: { "NodeName": { "main": [ [{"node": "TargetNode", ...}] ] } }
+    edges = graph["edges"]
     connections = data.get("connections", {})
     for source_name, output_types in connections.items():
         source_id = node_map.get(source_name, source_name)
@@ -382,7 +482,7 @@ def _parse_n8n(data: dict, result: dict) -> None:
                        target_name = link.get("node")
                        target_id = node_map.get(target_name, target_name)
                        
-                       graph["edges"].append({
+                       edges.append({
                            "source": source_id,
                            "target": target_id,
                            "type": output_type
@@ -392,6 +492,10 @@ def _parse_n8n(data: dict, result: dict) -> None:
 def _parse_flowise(data: dict, result: dict) -> None:
     """Extract graph from Flowise chatflow export."""
     graph = result["workflow_graph"]
+    graph_nodes = graph["nodes"]
+    trigger_nodes = graph["trigger_nodes"]
+    sink_nodes = graph["sink_nodes"]
+    prompt_found = bool(result["system_prompt"])
     
     # Flowise uses 'nodes' and 'edges' lists directly
     for n in data.get("nodes", []):
@@ -404,15 +508,16 @@ def _parse_flowise(data: dict, result: dict) -> None:
          creds = node_data.get("credential")
          
          # Heuristic detection
-         is_trigger = "input" in node_type.lower() or "webhook" in node_type.lower()
-         is_sink = "output" in node_type.lower() or "database" in node_type.lower()
+         type_lower = node_type.lower()
+         is_trigger = "input" in type_lower or "webhook" in type_lower
+         is_sink = "output" in type_lower or "database" in type_lower
          
          # Prompts
-         if "template" in inputs and isinstance(inputs["template"], str):
-              if not result["system_prompt"]:
-                   result["system_prompt"] = inputs["template"]
+         if not prompt_found and "template" in inputs and isinstance(inputs["template"], str):
+              result["system_prompt"] = inputs["template"]
+              prompt_found = bool(inputs["template"])
 
-         graph["nodes"].append({
+         graph_nodes.append({
              "id": node_id,
              "name": label,
              "type": node_type,
@@ -422,11 +527,12 @@ def _parse_flowise(data: dict, result: dict) -> None:
              "credentials": [creds] if creds else []
          })
          
-         if is_trigger: graph["trigger_nodes"].append(node_id)
-         if is_sink: graph["sink_nodes"].append(node_id)
+         if is_trigger: trigger_nodes.append(node_id)
+         if is_sink: sink_nodes.append(node_id)
          
+    edges = graph["edges"]
     for e in data.get("edges", []):
-         graph["edges"].append({
+         edges.append({
              "source": e.get("source"),
              "target": e.get("target"),
              "type": e.get("type", "default")
@@ -452,93 +558,81 @@ def _parse_langchain(data: dict, result: dict) -> None:
 # Generic Helpers
 # ---------------------------------------------------------------------------
 
-def _extract_from_dict(data: dict | list, result: dict) -> None:
+def _extract_config_sections(data: Any, result: dict) -> None:
     """
-    Recursively walk dict/list to find known keys (prompt, tools, etc.)
+    Walk dict/list config data once, depth-first, and collect every known key
+    (prompt, tools, permissions, output handlers and the newer OWASP
+    categories) found at any level into the matching result section.
     """
-    if isinstance(data, dict):
-        # 1. Check for system prompt
-        for k in PROMPT_KEYS:
-            if k in data and isinstance(data[k], str) and data[k].strip():
-                if not result["system_prompt"]:
-                    result["system_prompt"] = data[k]
-        
-        # 2. Check for tools
-        for k in TOOL_KEYS:
-            if k in data and isinstance(data[k], list):
-                result["tools"].extend(data[k])
-        
-        # 3. Check for permissions
-        for k in PERMISSION_KEYS:
-            if k in data and isinstance(data[k], list):
-                result["permissions"].extend(data[k])
-        
-        # 4. Check for output handlers
-        for k in OUTPUT_HANDLER_KEYS:
-            if k in data:
-                val = data[k]
-                if isinstance(val, (dict, list)):
-                    if isinstance(val, dict):
-                        result["output_handlers"].append(val)
-                    elif isinstance(val, list):
-                        result["output_handlers"].extend(val)
-
-        # Recurse
-        for v in data.values():
-            if isinstance(v, (dict, list)):
-                _extract_from_dict(v, result)
-
-    elif isinstance(data, list):
-        for item in data:
-            _extract_from_dict(item, result)
+    stack: list[Any] = [data]
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type is dict:
+            children = node.values()
+            for k, v in node.items():
+                section = _CONFIG_KEY_SECTIONS.get(k)
+                if section is None:
+                    continue
+                name, kind = section
+                if kind == "dict":
+                    result[name][k] = v
+                elif kind == "prompt":
+                    if not result["system_prompt"] and isinstance(v, str) and v.strip():
+                        result["system_prompt"] = v
+                elif type(v) is list:
+                    result[name].extend(v)
+                elif kind == "handler" and type(v) is dict:
+                    result[name].append(v)
+        elif node_type is list:
+            children = node
+        else:
+            continue
+        # Push in reverse so children are visited in document order
+        stack.extend(v for v in reversed(children) if type(v) in _CONTAINER_TYPES)
 
 
-def _extract_new_categories(data: dict | list, result: dict) -> None:
-    """
-    Top-level scan for 6 new OWASP categories using specialized keys.
+def _collect_config_flags(data: Any) -> dict[str, bool] | None:
     """
-    if isinstance(data, dict):
-        scan_map = {
-            "model_supply_chain": _SUPPLY_CHAIN_KEYS,
-            "training_ingestion": _TRAINING_INGESTION_KEYS,
-            "rag_vector": _RAG_VECTOR_KEYS,
-            "policy_misinfo": {"misinformation", "disclaimer", "citation_policy"}, # Basic keyword check
-            "resource_limits": _RESOURCE_LIMIT_KEYS,
-        }
-
-        # Check keys in the current dict level
-        for category, key_set in scan_map.items():
-            found_data = {}
-            for k, v in data.items():
-                if k in key_set:
-                    found_data[k] = v
-            # Merge if found
-            if found_data:
-                result[category].update(found_data)
-
-        # Recurse for nested configs
-        for v in data.values():
-            if isinstance(v, (dict, list)):
-                _extract_new_categories(v, result)
+    Flatten every boolean in parsed config data to {dotted.path: value}, with
+    keys lowercased and list items addressed by index (e.g. "model.sbom.enabled",
+    "adapters.0.verified"), so detectors can look flags up instead of
+    re-scanning raw_content.
 
-    elif isinstance(data, list):
-        for item in data:
-            _extract_new_categories(item, result)
+    Returns None when the document is a bare scalar (e.g. YAML prose), so
+    detectors fall back to scanning the text.
+    """
+    if type(data) not in _CONTAINER_TYPES:
+        return None
+    flags: dict[str, bool] = {}
+    stack: list[tuple[str, Any]] = [("", data)]
+    while stack:
+        prefix, node = stack.pop()
+        node_type = type(node)
+        if node_type is dict:
+            items = ((str(k).lower(), v) for k, v in node.items())
+        elif node_type is list:
+            items = ((str(i), v) for i, v in enumerate(node))
+        else:
+            continue
+        for key, value in items:
+            value_type = type(value)
+            if value_type is bool:
+                flags[f"{prefix}.{key}" if prefix else key] = value
+            elif value_type in _CONTAINER_TYPES:
+                stack.append((f"{prefix}.{key}" if prefix else key, value))
+    return flags
 
 
-def _extract_policy_misinfo_from_text(content: str) -> dict:
+def _extract_policy_misinfo_from_text(content_lower: str) -> dict:
     """
-    Analyze raw text for Misinformation (LLM09) signals.
+    Analyze lowercased raw text for Misinformation (LLM09) signals.
     Looks for: high-stakes domain keywords + bad practice instructions.
     """
-    high_stakes = ["medical", "diagnosis", "treatment", "legal info", "financial advice", "tax advice"]
-    bad_practices = ["answer confidently", "always answer", "never say you don't know", "ignore disclaimers"]
-    
     found = {}
-    content_lower = content.lower()
     
-    matches_hs = [w for w in high_stakes if w in content_lower]
-    matches_bp = [w for w in bad_practices if w in content_lower]
+    matches_hs = [w for w in _HIGH_STAKES_TERMS if w in content_lower]
+    matches_bp = [w for w in _RISKY_INSTRUCTIONS if w in content_lower]
     
     if matches_hs:
         found["high_stakes_topics"] = matches_hs
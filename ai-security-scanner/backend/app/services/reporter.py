@@ -1,6 +1,8 @@
 
+import io
 import os
 from datetime import datetime
+from typing import BinaryIO
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -10,16 +12,32 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from app.models.scan_response import ScanResponse, VulnerabilityFinding
 from app.core.config import settings
 
-def generate_pdf_report(scan_results: dict | ScanResponse, output_path: str) -> str:
+def generate_pdf_report(scan_results: dict | ScanResponse, output_path: str | os.PathLike) -> str:
     """
     Generates a PDF report for the scan results.
     Returns the absolute path to the generated PDF.
     """
+    output_path = os.fspath(output_path)
     # Ensure directory exists
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
+    _build_pdf(scan_results, output_path)
+    return output_path
+
+
+def render_pdf_report(scan_results: dict | ScanResponse) -> bytes:
+    """
+    Render the PDF report in memory and return its bytes.
+    Lets callers write the file asynchronously instead of inside ReportLab.
+    """
+    buffer = io.BytesIO()
+    _build_pdf(scan_results, buffer)
+    return buffer.getvalue()
+
+
+def _build_pdf(scan_results: dict | ScanResponse, target: str | BinaryIO) -> None:
+    """Build the report story and write it to a path or binary file object."""
     doc = SimpleDocTemplate(
-        output_path,
+        target,
         pagesize=letter,
         rightMargin=50, leftMargin=50,
         topMargin=50, bottomMargin=50
@@ -172,7 +190,6 @@ def generate_pdf_report(scan_results: dict | ScanResponse, output_path: str) ->
         story.append(Spacer(1, 6))
 
     doc.build(story)
-    return output_path
 
 def _add_findings_to_story(findings, story, styles):
     if not findings:
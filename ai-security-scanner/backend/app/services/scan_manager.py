@@ -1,35 +1,83 @@
 import asyncio
+import codecs
 import time
 import uuid
-import uuid
+from collections.abc import AsyncIterator
 from datetime import datetime, timezone
 
+from anyio.streams.memory import MemoryObjectSendStream
 from fastapi import UploadFile
 from app.core.config import settings
 from app.core.logging import logger
-from app.core.security import check_file_size, sanitize_content, validate_upload
+from app.core.security import check_file_size, sanitize_bytes, validate_upload
 from app.models.scan_response import ScanResponse, VulnerabilityFinding
 from app.services import detector_llm, detector_rule
 from app.services.parser import parse_file
 from app.services.scorer import calculate_risk_score
 
-# Global concurrency limit
-_SCAN_SEMAPHORE = asyncio.Semaphore(3)
+# Global concurrency limit (per worker)
+_SCAN_SEMAPHORE = asyncio.Semaphore(settings.MAX_PARALLEL_SCANS)
+
+# Upload read size — peak buffer per read is one chunk, not the whole file
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def iter_upload(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Yield an upload in fixed-size chunks.
+    The size limit is enforced on the running total, so an oversized file
+    raises 413 as soon as it crosses the limit instead of after a full read.
+    """
+    received = 0
+    while chunk := await file.read(chunk_size):
+        received += len(chunk)
+        check_file_size(received)
+        yield chunk
 
-async def process_single_file(file: UploadFile, progress_queue: asyncio.Queue = None) -> ScanResponse:
+
+async def _read_text(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    """
+    Read an upload chunk by chunk, sanitizing the raw bytes and decoding them
+    incrementally as UTF-8 (raises UnicodeDecodeError), so the whole file is
+    never held as bytes and text at once.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts = []
+    # A newline run may continue into the next chunk; hold it back so
+    # sanitize_bytes sees the whole run before collapsing it.
+    tail = b""
+    async for chunk in iter_upload(file, chunk_size):
+        data = tail + chunk.translate(None, b"\x00")
+        body = data.rstrip(b"\n")
+        tail = data[len(body):]
+        parts.append(decoder.decode(sanitize_bytes(body)))
+    parts.append(decoder.decode(sanitize_bytes(tail), final=True))
+    return "".join(parts)
+
+
+async def load_upload(file: UploadFile) -> tuple[str, str, str | None]:
+    """
+    Validate, read and sanitize an upload into memory.
+    Returns (filename, file_type, text); text is None if the file isn't valid UTF-8.
+    """
+    file_type = validate_upload(file)
+    try:
+        text_content = await _read_text(file)
+    except UnicodeDecodeError:
+        logger.error("File processing failed | filename=%s | error=UnicodeDecodeError", file.filename)
+        text_content = None
+    return file.filename, file_type, text_content
+
+
+async def scan_loaded(filename: str, file_type: str, text_content: str | None,
+                      progress: MemoryObjectSendStream | None = None) -> ScanResponse:
+    """Scan an already-read upload under the global concurrency limit."""
     async with _SCAN_SEMAPHORE:
-        file_type = validate_upload(file)
-        content = await file.read()
-        check_file_size(content)
-        
-        try:
-            text_content = content.decode("utf-8")
-        except UnicodeDecodeError:
-            logger.error("File processing failed | filename=%s | error=UnicodeDecodeError", file.filename)
+        if text_content is None:
             return ScanResponse(
                 scan_id=str(uuid.uuid4()),
                 timestamp=datetime.now(timezone.utc).isoformat(),
-                file_name=file.filename or "unknown",
+                file_name=filename or "unknown",
                 file_type=file_type,
                 risk_score=0,
                 risk_level="Low",
@@ -38,33 +86,37 @@ async def process_single_file(file: UploadFile, progress_queue: asyncio.Queue =
                 scan_duration=0.1
             )
 
-        text_content = sanitize_content(text_content)
-        if progress_queue:
-            await progress_queue.put({
+        if progress:
+            await progress.send({
                 "type": "file_start",
-                "filename": file.filename,
+                "filename": filename,
                 "timestamp": datetime.now().isoformat()
             })
             
-        result = await _scan_content(text_content, file.filename, file_type, progress_queue)
+        result = await _scan_content(text_content, filename, file_type, progress)
         
-        if progress_queue:
+        if progress:
             # Try to serialize using model_dump (Pydantic v2) or dict (v1)
             try:
                 result_dict = result.model_dump()
             except AttributeError:
                 result_dict = result.dict()
             
-            await progress_queue.put({
+            await progress.send({
                 "type": "file_complete",
-                "filename": file.filename,
+                "filename": filename,
                 "scan_id": result.scan_id,
                 "risk_score": result.risk_score,
                 "result": result_dict
             })
         return result
 
-async def _scan_content(text_content: str, filename: str, file_type: str, progress_queue: asyncio.Queue = None) -> ScanResponse:
+
+async def process_single_file(file: UploadFile, progress: MemoryObjectSendStream | None = None) -> ScanResponse:
+    return await scan_loaded(*await load_upload(file), progress)
+
+async def _scan_content(text_content: str, filename: str, file_type: str, progress: MemoryObjectSendStream | None = None,
+                        timestamp: str | None = None) -> ScanResponse:
     start_time = time.perf_counter()
     timings = {}
     scan_id = str(uuid.uuid4())
@@ -74,27 +126,15 @@ async def _scan_content(text_content: str, filename: str, file_type: str, progre
     t0 = time.perf_counter()
     parsed = parse_file(text_content, file_type)
     timings["parser"] = round(time.perf_counter() - t0, 3)
-    if progress_queue:
-        await progress_queue.put({"type": "progress", "filename": filename, "phase": "parsing", "status": "done"})
+    if progress:
+        await progress.send({"type": "progress", "filename": filename, "phase": "parsing", "status": "done"})
 
     # Rules
     t1 = time.perf_counter()
-    rule_results = await asyncio.gather(
-        detector_rule.detect_prompt_injection_rules(parsed),
-        detector_rule.detect_sensitive_info_rules(parsed),
-        detector_rule.detect_improper_output_rules(parsed),
-        detector_rule.detect_excessive_agency_rules(parsed),
-        detector_rule.detect_supply_chain_rules(parsed),
-        detector_rule.detect_data_poisoning_rules(parsed),
-        detector_rule.detect_system_prompt_leakage_rules(parsed),
-        detector_rule.detect_vector_embedding_rules(parsed),
-        detector_rule.detect_misinformation_rules(parsed),
-        detector_rule.detect_unbounded_consumption_rules(parsed),
-    )
-    rule_findings = [f for sublist in rule_results for f in sublist]
+    rule_findings = await detector_rule.run_all_rule_scans(parsed)
     timings["rules"] = round(time.perf_counter() - t1, 3)
-    if progress_queue:
-        await progress_queue.put({"type": "progress", "filename": filename, "phase": "rules", "status": "done"})
+    if progress:
+        await progress.send({"type": "progress", "filename": filename, "phase": "rules", "status": "done"})
 
     # LLM
     t2 = time.perf_counter()
@@ -104,14 +144,18 @@ async def _scan_content(text_content: str, filename: str, file_type: str, progre
         logger.error("LLM detection failed | %s | scan_id=%s", exc, scan_id)
         llm_findings = []
     timings["llm_engine"] = round(time.perf_counter() - t2, 3)
-    if progress_queue:
-        await progress_queue.put({"type": "progress", "filename": filename, "phase": "llm", "status": "done"})
+    if progress:
+        await progress.send({"type": "progress", "filename": filename, "phase": "llm", "status": "done"})
 
     # Merge
     t3 = time.perf_counter()
     all_raw = rule_findings + llm_findings
     findings = []
     for raw in all_raw:
+        # LLM findings arrive already validated; rule findings are plain dicts
+        if isinstance(raw, VulnerabilityFinding):
+             findings.append(raw)
+             continue
         try:
              raw.setdefault("description", "No description.")
              raw.setdefault("remediation", "Review manually.")
@@ -127,7 +171,7 @@ async def _scan_content(text_content: str, filename: str, file_type: str, progre
 
     return ScanResponse(
         scan_id=scan_id,
-        timestamp=datetime.now(timezone.utc).isoformat(),
+        timestamp=timestamp or datetime.now(timezone.utc).isoformat(),
         file_name=filename or "unknown",
         file_type=file_type,
         risk_score=risk_data["risk_score"],
@@ -144,10 +188,10 @@ async def _scan_content(text_content: str, filename: str, file_type: str, progre
         timings=timings,
     )
 
-async def scan_files_concurrently(files: list[UploadFile], progress_queue: asyncio.Queue = None) -> list[ScanResponse]:
-    tasks = [process_single_file(file, progress_queue) for file in files]
+async def scan_files_concurrently(files: list[UploadFile], progress: MemoryObjectSendStream | None = None) -> list[ScanResponse]:
+    tasks = [process_single_file(file, progress) for file in files]
     return await asyncio.gather(*tasks)
 
-async def scan_text_content(content: str, filename: str) -> ScanResponse:
+async def scan_text_content(content: str, filename: str, timestamp: str | None = None) -> ScanResponse:
     # Wrapper for text scan
-    return await _scan_content(content, filename, ".txt")
+    return await _scan_content(content, filename, ".txt", timestamp=timestamp)
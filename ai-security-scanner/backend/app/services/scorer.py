@@ -12,6 +12,7 @@ Risk levels:
     76–100: Critical
 """
 
+from bisect import bisect_right
 from typing import Any
 
 from app.models.scan_response import VulnerabilityFinding
@@ -44,19 +45,14 @@ SEVERITY_MULTIPLIERS: dict[str, float] = {
 }
 
 # Risk level thresholds (PRD Section 6 FR6)
-_THRESHOLDS = [
-    (76, "Critical"),
-    (51, "High"),
-    (26, "Medium"),
-    (0,  "Low"),
-]
+# _LEVELS[i] applies from _THRESHOLDS[i - 1] up to (not including) _THRESHOLDS[i].
+_THRESHOLDS = (26, 51, 76)
+_LEVELS = ("Low", "Medium", "High", "Critical")
 
 
-def _get_risk_level(score: int) -> str:
-    for threshold, level in _THRESHOLDS:
-        if score >= threshold:
-            return level
-    return "Low"
+def get_risk_level(score: int) -> str:
+    """Map a 0–100 risk score to its risk level via one binary search."""
+    return _LEVELS[bisect_right(_THRESHOLDS, score)]
 
 
 def calculate_risk_score(findings: list[VulnerabilityFinding]) -> dict[str, Any]:
@@ -122,7 +118,7 @@ def calculate_risk_score(findings: list[VulnerabilityFinding]) -> dict[str, Any]
             severity_counts[severity] += 1
 
     risk_score = min(int(round(total_score)), 100)
-    risk_level = _get_risk_level(risk_score)
+    risk_level = get_risk_level(risk_score)
 
     # Build human-readable summary
     critical_high = severity_counts["Critical"] + severity_counts["High"]
@@ -3,16 +3,25 @@ Vertex AI / Gemini 2.0 Flash client.
 
 Key design decisions:
 - vertexai.init() is called once at construction time (not per-request)
-- generate_content() is synchronous in the SDK; we wrap it with
-  asyncio.to_thread() so it doesn't block the FastAPI event loop
+- Calls use the SDK's generate_content_async(), which runs over the
+  model's cached PredictionServiceAsyncClient (gRPC, grpc_asyncio) — one
+  HTTP/2 channel multiplexes concurrent scans, with no worker thread per call
 - A single shared instance is created at module level and reused
+- Single-category responses are streamed; a response that opens with
+  "found": false is closed early instead of generating prose we'd discard
+- Successful responses are cached on disk (diskcache) keyed by a hash of
+  model + prompt, so rescanning an identical config skips Gemini entirely;
+  the cache is sharded so several uvicorn workers can share one directory
 """
 
 import asyncio
-import json
+import hashlib
+import re
 import os
 import traceback
 
+import diskcache
+import orjson
 import vertexai
 from vertexai.preview.generative_models import GenerativeModel, GenerationConfig
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -35,6 +44,45 @@ _FALLBACK = {
 }
 
 
+# Structured-output schema for one finding in a multi-category response
+_FINDING_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "category": {"type": "STRING"},
+        "found": {"type": "BOOLEAN"},
+        "severity": {"type": "STRING", "enum": ["Critical", "High", "Medium", "Low"]},
+        "confidence": {"type": "NUMBER"},
+        "evidence": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "description": {"type": "STRING"},
+        "attack_scenario": {"type": "STRING"},
+        "remediation": {"type": "STRING"},
+        "owasp_reference": {"type": "STRING"},
+    },
+    "required": ["category", "found", "severity", "confidence"],
+}
+
+
+# Matches a (possibly fenced) JSON object whose first key is "found"
+_FOUND_PREFIX_RE = re.compile(r'\s*(?:```(?:json)?\s*)?\{\s*"found"\s*:\s*(true|false)')
+
+# Result for a response closed early after "found": false
+_NOT_FOUND = {"found": False}
+
+# Marks a streamed response with no candidates (safety filter)
+_BLOCKED = object()
+
+
+def _parse_json_text(raw_text: str):
+    """Parse a Gemini text response, stripping markdown code fences if present."""
+    raw_text = raw_text.strip()
+    if raw_text.startswith("```"):
+        raw_text = raw_text.split("```")[1]
+        if raw_text.startswith("json"):
+            raw_text = raw_text[4:]
+        raw_text = raw_text.strip()
+    return orjson.loads(raw_text)
+
+
 class VertexAIClient:
     """Thin async wrapper around the Vertex AI Gemini SDK."""
 
@@ -52,6 +100,18 @@ class VertexAIClient:
             location=settings.VERTEX_AI_LOCATION,
         )
         self._model = GenerativeModel(settings.VERTEX_AI_MODEL)
+        # Caps Gemini calls in flight across all scans in this worker
+        self._semaphore = asyncio.Semaphore(settings.LLM_SCAN_CONCURRENCY)
+        self._cache = (
+            diskcache.FanoutCache(
+                settings.LLM_CACHE_DIR,
+                shards=settings.LLM_CACHE_SHARDS,
+                timeout=1,          # a shard locked for over 1s reads as a miss
+                size_limit=1 << 30,
+                eviction_policy="least-recently-used",
+            )
+            if settings.LLM_SCAN_CACHE_TTL > 0 else None
+        )
         self._generation_config = GenerationConfig(
             temperature=0.1,        # Low for deterministic security analysis
             max_output_tokens=8192,
@@ -64,51 +124,175 @@ class VertexAIClient:
         )
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    async def _generate_with_retry(self, prompt: str):
-        return await asyncio.to_thread(
-            self._model.generate_content,
+    async def _generate_with_retry(self, prompt: str, generation_config: GenerationConfig | None = None):
+        return await self._model.generate_content_async(
             prompt,
-            generation_config=self._generation_config,
+            generation_config=generation_config or self._generation_config,
+        )
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    async def _stream_with_retry(self, prompt: str):
+        """
+        Stream a single-category response. Returns None as soon as it opens
+        with "found": false, _BLOCKED if Gemini returns no candidates, and
+        the full response text otherwise.
+        """
+        stream = await self._model.generate_content_async(
+            prompt, generation_config=self._generation_config, stream=True,
+        )
+        text = ""
+        try:
+            async for chunk in stream:
+                if not chunk.candidates:
+                    return _BLOCKED
+                text += chunk.text
+                decided = _FOUND_PREFIX_RE.match(text)
+                if decided and decided.group(1) == "false":
+                    return None
+            return text
+        finally:
+            # Closing the stream cancels the rest of the generation
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def _stream(self, prompt: str):
+        """Streaming counterpart of _generate, under the same slot and timeout."""
+        async with self._semaphore:
+            return await asyncio.wait_for(
+                self._stream_with_retry(prompt),
+                timeout=settings.LLM_SCAN_TIMEOUT,
+            )
+
+    async def _generate(self, prompt: str, generation_config: GenerationConfig | None = None):
+        """
+        Bounded Gemini call: waits for a concurrency slot, then gives up after
+        LLM_SCAN_TIMEOUT so a throttled or hung request can't stall a scan.
+        """
+        async with self._semaphore:
+            return await asyncio.wait_for(
+                self._generate_with_retry(prompt, generation_config),
+                timeout=settings.LLM_SCAN_TIMEOUT,
+            )
+
+    def _cache_key(self, prompt: str) -> str:
+        return hashlib.blake2b(
+            f"{settings.VERTEX_AI_MODEL}\n{prompt}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+    # Cache reads and writes are SQLite I/O that can wait on a locked shard,
+    # so they run in a worker thread rather than on the event loop.
+    async def _cache_get(self, prompt: str):
+        if self._cache is None:
+            return None
+        return await asyncio.to_thread(self._cache.get, self._cache_key(prompt))
+
+    async def _cache_set(self, prompt: str, result) -> None:
+        # Only successful parses are stored; fallbacks are never cached
+        if self._cache is not None:
+            await asyncio.to_thread(
+                self._cache.set, self._cache_key(prompt), result, expire=settings.LLM_SCAN_CACHE_TTL
+            )
+
+    def _array_config(self, count: int) -> GenerationConfig:
+        """Generation config constraining the response to exactly `count` findings."""
+        return GenerationConfig(
+            temperature=0.1,
+            max_output_tokens=8192,
+            top_p=0.95,
+            response_mime_type="application/json",
+            response_schema={
+                "type": "ARRAY",
+                "items": _FINDING_SCHEMA,
+                "minItems": count,
+                "maxItems": count,
+            },
         )
 
     async def analyze_with_llm(self, prompt: str) -> dict:
         """
         Send a prompt to Gemini and return a parsed JSON dict.
 
-        Uses asyncio.to_thread() because the Vertex AI SDK's
-        generate_content() is synchronous and would otherwise block
-        the FastAPI event loop during the 2-4 second API call.
+        The response is streamed with the SDK's async API; when it opens with
+        "found": false the stream is closed and {"found": False} returned,
+        skipping the description/remediation text nobody reads.
         """
+        cached = await self._cache_get(prompt)
+        if cached is not None:
+            return cached
+
+        text = ""
         try:
-            response = await self._generate_with_retry(prompt)
+            text = await self._stream(prompt)
 
             # Guard against empty or blocked responses
-            if not response.candidates:
+            if text is _BLOCKED:
                 logger.warning("Gemini returned no candidates (likely safety filter).")
                 return {**_FALLBACK, "description": "Response blocked by safety filter."}
 
-            raw_text = response.text.strip()
-
-            # Strip markdown code fences if Gemini wraps JSON in them
-            if raw_text.startswith("```"):
-                raw_text = raw_text.split("```")[1]
-                if raw_text.startswith("json"):
-                    raw_text = raw_text[4:]
-                raw_text = raw_text.strip()
-
-            result = json.loads(raw_text)
+            result = dict(_NOT_FOUND) if text is None else _parse_json_text(text)
+            await self._cache_set(prompt, result)
             return result
 
-        except json.JSONDecodeError as exc:
-            logger.error("Gemini returned non-JSON: %s | error: %s", response.text[:200], exc)
+        except orjson.JSONDecodeError as exc:
+            logger.error("Gemini returned non-JSON: %s | error: %s", text[:200], exc)
             return {**_FALLBACK, "description": f"LLM returned malformed JSON: {exc}"}
 
+        except TimeoutError:
+            logger.error("Vertex AI API call timed out after %ss", settings.LLM_SCAN_TIMEOUT)
+            return {**_FALLBACK, "description": f"LLM analysis timed out after {settings.LLM_SCAN_TIMEOUT}s."}
+
         except Exception as exc:
             logger.error("Vertex AI API call FAILED: %s: %s", type(exc).__name__, exc)
             logger.error("Full traceback:\n%s", traceback.format_exc())
             return {**_FALLBACK, "description": f"LLM analysis error: {type(exc).__name__}: {exc}"}
 
 
+    async def analyze_with_llm_multi(self, prompt: str, count: int) -> list[dict] | None:
+        """
+        Send one prompt that covers several categories and return its JSON
+        array of findings. Returns None on any failure so the caller can fall
+        back to per-category prompts.
+        """
+        cached = await self._cache_get(prompt)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self._generate(prompt, self._array_config(count))
+            if not response.candidates:
+                logger.warning("Gemini returned no candidates for multi-category scan.")
+                return None
+            result = _parse_json_text(response.text)
+        except Exception as exc:
+            logger.error("Multi-category Gemini call FAILED: %s: %s", type(exc).__name__, exc)
+            return None
+        if not isinstance(result, list) or not all(isinstance(r, dict) for r in result):
+            logger.error("Multi-category Gemini response is not a list of objects.")
+            return None
+        await self._cache_set(prompt, result)
+        return result
+
+    async def analyze_with_llm_batch(self, prompts: list[str]) -> list[dict]:
+        """
+        Analyze several prompts and return one parsed dict per prompt, in order.
+
+        Vertex AI batch prediction is an offline job API (inputs and outputs
+        go through GCS/BigQuery and jobs queue for minutes), so it can't serve
+        an interactive scan; the prompts are sent concurrently instead.
+        A failed prompt yields a fallback dict rather than an exception.
+        """
+        results = await asyncio.gather(
+            *(self.analyze_with_llm(prompt) for prompt in prompts),
+            return_exceptions=True,
+        )
+        return [
+            {**_FALLBACK, "description": f"LLM analysis error: {type(r).__name__}: {r}"}
+            if isinstance(r, Exception) else r
+            for r in results
+        ]
+
+
 # ---------------------------------------------------------------------------
 # Module-level singleton — created lazily on first use to avoid crashing
 # the import if Vertex AI credentials are not yet configured.
@@ -0,0 +1,11 @@
+
+import atexit
+import os
+import shutil
+import tempfile
+
+# Keep the LLM response cache out of the working tree and the user's cache
+# dir; set before app.core.config builds its settings.
+if "LLM_CACHE_DIR" not in os.environ:
+    os.environ["LLM_CACHE_DIR"] = tempfile.mkdtemp(prefix="llm-cache-test-")
+    atexit.register(shutil.rmtree, os.environ["LLM_CACHE_DIR"], True)
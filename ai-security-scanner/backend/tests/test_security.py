@@ -0,0 +1,69 @@
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.security import SizeLimitMiddleware, sanitize_bytes, sanitize_content
+
+
+def test_sanitize_strips_null_bytes():
+    assert sanitize_content("sys\x00tem\x00") == "system"
+
+
+def test_sanitize_collapses_blank_line_runs():
+    assert sanitize_content("a\n\n\n\n\nb") == "a\n\nb"
+    assert sanitize_content("a\n\n\nb") == "a\n\n\nb"
+
+
+def test_sanitize_collapses_runs_split_by_null_bytes():
+    # Matches the old two-step behaviour: strip nulls first, then collapse
+    assert sanitize_content("a\n\n\x00\n\nb") == "a\n\nb"
+
+
+def test_sanitize_bytes_matches_str_path():
+    raw = "héllo\x00\n\n\x00\n\n\nwörld\n\n\n".encode("utf-8")
+    assert sanitize_bytes(raw).decode("utf-8") == sanitize_content(raw.decode("utf-8"))
+
+
+def test_size_limit_middleware_rejects_large_content_length():
+    app = FastAPI()
+    app.add_middleware(SizeLimitMiddleware, max_body_size=16)
+
+    @app.post("/echo")
+    async def echo():
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.post("/echo", content=b"x" * 16).status_code == 200
+    assert client.post("/echo", content=b"x" * 17).status_code == 413
+
+
+def test_oversized_request_rejection_keeps_cors_headers():
+    from app.core.config import settings
+    from app.main import app
+
+    client = TestClient(app)
+    too_big = str(settings.MAX_REQUEST_SIZE_MB * 1024 * 1024 + 1)
+    response = client.post(
+        "/api/scan", headers={"Origin": "http://localhost:5173", "Content-Length": too_big}, content=b"",
+    )
+
+    assert response.status_code == 413
+    assert "access-control-allow-origin" in response.headers
+
+
+def test_chunked_upload_read_matches_whole_file_sanitize():
+    import asyncio
+    from app.services.scan_manager import _read_text
+
+    class Upload:
+        def __init__(self, data):
+            self.data = data
+
+        async def read(self, n):
+            chunk, self.data = self.data[:n], self.data[n:]
+            return chunk
+
+    raw = "héllo\x00\n\n\x00\n\n\nwörld\n\n\n\n\nend\n".encode("utf-8")
+    for size in (1, 2, 3, 5, len(raw)):
+        text = asyncio.run(_read_text(Upload(raw), chunk_size=size))
+        assert text == sanitize_content(raw.decode("utf-8"))
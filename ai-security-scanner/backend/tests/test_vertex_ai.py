@@ -0,0 +1,77 @@
+
+import asyncio
+
+from app.services import vertex_ai
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+        self.candidates = [object()]
+
+
+class FakeModel:
+    """Streams canned chunks and records how many were consumed."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        if not stream:
+            return Chunk("".join(self.chunks))
+
+        async def gen():
+            for text in self.chunks:
+                self.consumed += 1
+                yield Chunk(text)
+        return gen()
+
+
+def make_client(chunks):
+    client = object.__new__(vertex_ai.VertexAIClient)
+    client._model = FakeModel(chunks)
+    client._semaphore = asyncio.Semaphore(1)
+    client._cache = None
+    client._generation_config = None
+    client._array_config = lambda count: None
+    return client
+
+
+def test_stream_stops_early_on_found_false():
+    client = make_client(['{"found": ', 'false, "severity": "Low", ', '"description": "long prose"}'])
+
+    result = asyncio.run(client.analyze_with_llm("prompt"))
+
+    assert result == {"found": False}
+    assert client._model.consumed == 2
+
+
+def test_stream_reads_full_response_on_found_true():
+    client = make_client(['```json\n{"found": true, ', '"severity": "High"}\n```'])
+
+    result = asyncio.run(client.analyze_with_llm("prompt"))
+
+    assert result == {"found": True, "severity": "High"}
+    assert client._model.consumed == 2
+
+
+def test_multi_category_call_returns_array():
+    client = make_client(['[{"category": "LLM01:2025", "found": false}]'])
+
+    result = asyncio.run(client.analyze_with_llm_multi("prompt", 1))
+
+    assert result == [{"category": "LLM01:2025", "found": False}]
+
+
+def test_cached_response_skips_model(tmp_path):
+    import diskcache
+
+    client = make_client(['{"found": true, "severity": "High"}'])
+    client._cache = diskcache.Cache(str(tmp_path))
+
+    first = asyncio.run(client.analyze_with_llm("prompt"))
+    second = asyncio.run(client.analyze_with_llm("prompt"))
+
+    assert first == second == {"found": True, "severity": "High"}
+    assert client._model.consumed == 1
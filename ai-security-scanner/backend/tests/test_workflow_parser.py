@@ -137,3 +137,24 @@ def test_parser_fallback(generic_json):
     
     # Graph should be empty but present
     assert result["workflow_graph"]["nodes"] == []
+
+def test_config_sections_collected_in_document_order():
+    content = json.dumps({
+        "agent": {"preamble": "  ", "system": "First prompt", "callback": [{"u": 1}], "output": {"type": "html"}},
+        "fallback": {"prompt": "Second prompt", "rate_limit": 10},
+        "rate_limit": 5,
+    })
+    result = parse_file(content, "json")
+
+    assert result["system_prompt"] == "First prompt"
+    assert result["output_handlers"] == [{"u": 1}, {"type": "html"}]
+    assert result["resource_limits"] == {"rate_limit": 10}
+
+
+@pytest.mark.parametrize("sep", ["\n", "\r\n", "\r", "\x0c", "\u2028"])
+def test_txt_sections_split_on_every_line_break(sep):
+    content = sep.join(["Notes", "System:", "You are a billing bot.", "Be brief.", "Tools:", "lookup", ""])
+
+    result = parse_file(content, "txt")
+
+    assert result["system_prompt"] == "You are a billing bot.\nBe brief."